@@ -1,20 +1,39 @@
 import polygon as poly
 import polygon_generator as poly_gen
 import polygon_utilities as poly_utls
+import polygon_optimization as poly_optim
 from constants import *
 
 import time
 import sys
 import math
+import heapq
 import random
+import numpy as np
 import matplotlib.pyplot as plt
 from colorama import init, Fore
 
-from multiprocessing import Pool
+from multiprocessing import Pool, Value, shared_memory
 
 init(autoreset=True)
 NUMBER_OF_THREADS = 8
 
+# Number of polygons tested by each subprocess task of the brute force
+TASK_POLYGONS = 20_000
+
+# Number of chunks of each level given to a subprocess in get_min_include_exclude_parallel
+CHUNKS_PER_THREAD = 4
+
+# Relative margin on the bound of the brute force, so the float rounding never drops the best polygon
+BOUND_TOLERANCE = 1e-9
+
+# Dataset of a subprocess, set by attach_shared_points
+worker_memory = None  # SharedMemory holding the dataset's arrays
+worker_points = None
+worker_indexes = None  # Index of each point of worker_points
+worker_distances = None  # worker_distances[i][j]: distance between the points i and j
+worker_best_peri = None  # Best perimeter of all the subprocesses
+
 
 def update_bar(current, total, best_perimeter):
     """
@@ -84,7 +103,7 @@ def contains_all_blues_and_exclude_reds(polygon, points):
 
     pts_without_extremities = []
     for pt in points:
-        if pt not in polygon.points:
+        if not polygon.has_vertex(pt):
             pts_without_extremities.append(pt)
 
     for pt in pts_without_extremities:
@@ -97,119 +116,230 @@ def contains_all_blues_and_exclude_reds(polygon, points):
     return True
 
 
-def get_all_combinations(points, n):
+def unrank_combination(nb_pts, n, rank):
     """
-    Returns a list of all the combinations possible of n
-    points from a certain dataset.
+    Returns the indexes of the combination number rank (in the
+    lexicographic order) of n points from nb_pts points.
     """
 
-    # Choose only a few points
-    combinations = []
-    nb_pts = len(points)
-    indexes = list(range(n))  # [0, 1, 2, 3, ... n]
-    while True:
-        combinations.append([points[i] for i in indexes])
+    indexes = []
+    start = 0
+    for i in range(n, 0, -1):
+        # Skip all the combinations starting with a smaller index
+        while rank >= math.comb(nb_pts - start - 1, i - 1):
+            rank -= math.comb(nb_pts - start - 1, i - 1)
+            start += 1
+        indexes.append(start)
+        start += 1
+
+    return indexes
+
+
+def iterate_combinations(nb_pts, n, start, stop):
+    """
+    Gives the indexes of the combinations number start to
+    stop (excluded) of n points from nb_pts points.
+    """
+
+    if start >= stop:
+        return
+
+    indexes = unrank_combination(nb_pts, n, start)
+    for _ in range(stop - start):
+        yield indexes[:]
+
         for i in range(n - 1, -1, -1):
             if indexes[i] != i + nb_pts - n:
                 break
-
         else:
-            return combinations
+            return
 
         indexes[i] += 1
         for j in range(i + 1, n):
             indexes[j] = indexes[j - 1] + 1
 
 
-def get_all_permutations(points):
+def get_total_iterations(n):
     """
-    Implementation of the Heap’s algorithm
+    Get the actual number of polygons that can be generated from
+    a dataset of n points.
+    """
+
+    total = 0
+    for k in range(3, n+1):
+        total += math.comb(n, k) * math.factorial(k - 1) // 2
+    return total
 
-    Returns a list of all the permutations of
-    a certain list of points.
+
+def share_points(points):
+    """
+    Copy the coordinates and states of the points in a
+    shared memory block, so the subprocesses can read them
+    without receiving a copy.
+
+    :return: The SharedMemory (to close and unlink when the subprocesses are done)
     """
 
     nb_pts = len(points)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, 17 * nb_pts))
 
-    permutations = []
-    pts_copy = points[:]
-    counter = [0] * nb_pts
+    point_set = get_shared_point_set(memory, nb_pts)
+    point_set.x[:] = [pt.x for pt in points]
+    point_set.y[:] = [pt.y for pt in points]
+    point_set.states[:] = [pt.state for pt in points]
 
-    permutations.append(pts_copy[:])
+    return memory
 
-    k = 0
-    while k < nb_pts:
-        if counter[k] < k:
-            if k % 2 == 0:
-                pts_copy[0], pts_copy[k] = pts_copy[k], pts_copy[0]
-            else:
-                pts_copy[counter[k]], pts_copy[k] = pts_copy[k], pts_copy[counter[k]]
 
-            permutations.append(pts_copy[:])
-            counter[k] += 1
-            k = 0
-        else:
-            counter[k] = 0
-            k += 1
+def get_shared_point_set(memory, nb_pts):
+    """
+    PointSet using the arrays of a block made by share_points
+    (x, then y, then the states).
+    """
 
-    return permutations
+    x = np.ndarray(nb_pts, dtype=np.float64, buffer=memory.buf, offset=0)
+    y = np.ndarray(nb_pts, dtype=np.float64, buffer=memory.buf, offset=8 * nb_pts)
+    states = np.ndarray(nb_pts, dtype=np.uint8, buffer=memory.buf, offset=16 * nb_pts)
+    return poly.PointSet(x, y, states)
 
 
-def get_total_iterations(n):
+def attach_shared_points(memory_name, nb_pts):
     """
-    Get the actual number of polygons that can be generated from
-    a dataset of n points.
+    In a subprocess, use the dataset shared by share_points.
     """
 
-    total = 0
-    for k in range(3, n+1):
-        total += math.comb(n, k) * math.factorial(k)
-    return total
+    global worker_memory, worker_points, worker_indexes
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+
+    point_set = get_shared_point_set(worker_memory, nb_pts)
+    worker_points = point_set.get_points()
+    worker_indexes = {pt: i for i, pt in enumerate(worker_points)}
+
+    return point_set
+
+
+def init_brute_force_worker(memory_name, nb_pts, best_peri):
+    """
+    Each subprocess reads the dataset in the shared memory,
+    then only receives the ranges of combinations to test.
+    best_peri is the best perimeter found by all the
+    subprocesses (a multiprocessing.Value).
+    """
+
+    global worker_distances, worker_best_peri
+    point_set = attach_shared_points(memory_name, nb_pts)
+
+    x, y = point_set.x, point_set.y
+    worker_distances = np.sqrt((x[:, np.newaxis] - x) ** 2 + (y[:, np.newaxis] - y) ** 2).tolist()
+    worker_best_peri = best_peri
 
 
-def best_perimeter_task(combinations, points, counter, lock):
+def best_perimeter_task(n, start, stop):
     """
-    For subprocessing, separate each polygon brute force
-    generation in some smaller batches.
+    For subprocessing, test all the polygons made with the
+    combinations number start to stop of n points.
 
-    Returns the local best polygon.
+    Returns the local best polygon (as indexes in the dataset).
     """
 
     current_best = None
-    current_best_peri = -1
+    current_best_peri = math.inf
     iterations = 0
-    added_iterations = 0
 
-    for combination in combinations:
-        for permutation in get_all_permutations(combination):
-            iterations += 1
-            p = poly.Polygon(permutation, create_patch=False, update_bounds=False)
+    for indexes in iterate_combinations(len(worker_points), n, start, stop):
+        cycle, peri = get_best_cycle(indexes, current_best_peri)
+        if cycle is not None:
+            current_best = cycle
+            current_best_peri = peri
+        iterations += math.factorial(n - 1) // 2
 
-            peri = p.get_perimeter()
-            if current_best is None or peri < current_best_peri:
-                if contains_all_blues_and_exclude_reds(p, points):
-                    current_best = p
-                    current_best_peri = peri
+    if current_best is None:
+        current_best_peri = -1
 
-    return {"best_peri": current_best_peri, "best_poly": current_best, "i": iterations}
+    return {"best_peri": current_best_peri, "best_poly": current_best, "i": iterations, "position": (n, start)}
 
 
-def separate_combinations(combinations, n):
+def get_best_cycle(indexes, best_peri):
     """
-    Split a list of combinations into some smaller lists in
-    order to create some subprocesses.
+    Branch and bound on the polygons made of all the points.
+    Each polygon is built only once: the first point stays first
+    and the last point comes after the second one (no rotation or
+    reversal of the same polygon).
+    The cycles are built one vertex at a time (depth first), and
+    a path is dropped as soon as its length, plus the shortest
+    way to go back to the first point through any of the points
+    left, is longer than the best perimeter (of this subprocess
+    or of all of them).
+
+    Returns the best valid cycle shorter than best_peri and its
+    perimeter, or (None, best_peri).
     """
 
-    blocks_steps = len(combinations) // n
-    blocks = []
-    for i in range(n):
-        start = i * blocks_steps
-        if i < n - 1:
-            blocks.append(combinations[start:start + blocks_steps])
-        else:
-            blocks.append(combinations[start:])
+    first, others = indexes[0], indexes[1:]
+    distances = worker_distances
+
+    path = [first]
+    used = [False] * len(others)
+    best = [None, best_peri]  # [cycle, perimeter]
+
+    def get_bound():
+        # Equal perimeters are not dropped, so the first polygon found stays the same
+        return min(best[1], worker_best_peri.value) * (1 + BOUND_TOLERANCE)
 
-    return blocks
+    def extend(length, second):
+        current = path[-1]
+        remaining = [i for i in range(len(others)) if not used[i]]
+
+        if not remaining:
+            if length + distances[current][first] > get_bound():
+                return
+
+            p = poly.Polygon([worker_points[i] for i in path], create_patch=False, update_bounds=False)
+            peri = p.get_perimeter()
+            if peri < best[1] and contains_all_blues_and_exclude_reds(p, worker_points):
+                best[0], best[1] = path[:], peri
+                with worker_best_peri.get_lock():
+                    if peri < worker_best_peri.value:
+                        worker_best_peri.value = peri
+            return
+
+        lower_bound = max(distances[current][others[i]] + distances[others[i]][first] for i in remaining)
+        if length + lower_bound > get_bound():
+            return
+
+        for i in remaining:
+            # Only one orientation: the last point comes after the second one in the combination
+            if len(remaining) == 1 and second is not None and i < second:
+                continue
+
+            used[i] = True
+            path.append(others[i])
+            extend(length + distances[current][others[i]], i if second is None else second)
+            path.pop()
+            used[i] = False
+
+    extend(0, None)
+    return best[0], best[1]
+
+
+def best_perimeter_task_star(task):
+    return best_perimeter_task(*task)
+
+
+def get_brute_force_tasks(nb_pts, nb_threads):
+    """
+    Ranges of combinations (n, start, stop) for all the
+    numbers of points n, each one with about TASK_POLYGONS
+    polygons to test. The small tasks keep all the subprocesses
+    busy until the end.
+    """
+
+    for n in range(3, nb_pts + 1):
+        nb_combinations = math.comb(nb_pts, n)
+        nb_cycles = math.factorial(n - 1) // 2
+        step = max(1, min(TASK_POLYGONS // nb_cycles, nb_combinations // nb_threads))
+        for start in range(0, nb_combinations, step):
+            yield n, start, min(start + step, nb_combinations)
 
 
 def get_best_perimeter_polygon(points, callback=None, nb_threads=NUMBER_OF_THREADS):
@@ -224,39 +354,70 @@ def get_best_perimeter_polygon(points, callback=None, nb_threads=NUMBER_OF_THREA
 
     current_best = None
     current_best_peri = -1
+    current_best_position = None
 
     theorical_max = get_total_iterations(len(points))
     i = 0
 
-    with Pool(nb_threads) as pool:
-        for k in range(3, len(points) + 1):
-            all_combinations = get_all_combinations(points, k)
-            combinations_blocks = separate_combinations(all_combinations, nb_threads)
-            infos_blocks = [(combinations_blocks[i], points, None, None) for i in range(len(combinations_blocks))]
+    memory = share_points(points)
+    best_peri = Value('d', math.inf)
 
-            results = pool.starmap(best_perimeter_task, infos_blocks)
-            for result in results:
+    try:
+        with Pool(nb_threads, initializer=init_brute_force_worker, initargs=(memory.name, len(points), best_peri)) as pool:
+            tasks = get_brute_force_tasks(len(points), nb_threads)
+            for result in pool.imap_unordered(best_perimeter_task_star, tasks):
                 i += result["i"]
-                if current_best is None or (result["best_peri"] != -1 and result["best_peri"] < current_best_peri):
+
+                # On equal perimeters, keep the first polygon in the enumeration order
+                if result["best_poly"] is not None and (
+                        current_best is None or
+                        (result["best_peri"], result["position"]) < (current_best_peri, current_best_position)):
                     current_best_peri = result["best_peri"]
+                    current_best_position = result["position"]
                     current_best = result["best_poly"]
 
-            if current_best_peri is not None:
-                callback(i, theorical_max, current_best_peri)
+                if callback is not None:
+                    callback(i, theorical_max, current_best_peri)
+    finally:
+        memory.close()
+        memory.unlink()
+
+    if current_best is None:
+        return None
+
+    return poly.Polygon([points[i] for i in current_best], create_patch=False, update_bounds=False)
+
 
-    return current_best
+def get_cycle_key(cycle):
+    """
+    Same key for all the rotations and the reversal
+    of a cycle of point indexes.
+    """
 
+    start = cycle.index(min(cycle))
+    forward = cycle[start:] + cycle[:start]
+    backward = forward[:1] + forward[:0:-1]
+    return tuple(min(forward, backward))
 
-def get_min_perimeter_include_exclude(points, calculated_min=None, constraint=MINIMIZE_PERIMETER):
+
+def get_min_perimeter_include_exclude(points, calculated_min=None, constraint=MINIMIZE_PERIMETER, best_first=False,
+                                      nb_threads=None):
     """
     New algorithm.
     Test all polygons created by generating all include/exclude step orders
 
     :param points: The set of blue and red points
     :param calculated_min: The perimeter calculated by the actual algorithm
+    :param best_first: Use get_min_include_exclude_best_first instead of the search level by level
+    :param nb_threads: Split each level between subprocesses (get_min_include_exclude_parallel)
     :return: (polygon with the smallest perimeter, perimeter)
     """
 
+    if best_first:
+        return get_min_include_exclude_best_first(points, calculated_min, constraint)
+    if nb_threads is not None:
+        return get_min_include_exclude_parallel(points, calculated_min, constraint, nb_threads)
+
     min_peri = None
     min_peri_poly = None
 
@@ -264,14 +425,18 @@ def get_min_perimeter_include_exclude(points, calculated_min=None, constraint=MI
     hull.convex_hull(points)
     hull.update_lines()
 
+    indexes = {pt: i for i, pt in enumerate(points)}
+
     current_search = [hull]
     i = 0
     while current_search:
         next_search = []
+
+        # All the polygons of a level have the same number of vertices,
+        # so a polygon can only be found again in the same level
+        visited = set()
         for search in current_search:
-            problematic_reds = poly_utls.get_included_excluded(points, search)
-            problematic_blues = poly_utls.get_excluded_included(points, search, constraint)
-            problematic_pts = problematic_reds + problematic_blues
+            problematic_pts = get_problematic_points(points, search, constraint)
 
             if len(problematic_pts) == 0:
                 peri = search.get_perimeter() if constraint == MINIMIZE_PERIMETER else search.get_area()
@@ -280,31 +445,8 @@ def get_min_perimeter_include_exclude(points, calculated_min=None, constraint=MI
                     min_peri_poly = search
                 continue
 
-            for pt in problematic_pts:
-                for j in range(len(search.lines)):
-                    new_poly = poly.Polygon(search.points.copy(), search.lines.copy(), create_patch=None, update_bounds=False)
-                    # Insert the point pt at the position of the line
-                    ln = search.lines[j]
-                    l1 = poly.Line(ln.point1, pt)
-                    l2 = poly.Line(pt, ln.point2)
-
-                    del new_poly.lines[j]
-                    new_poly.lines.insert(j, l2)
-                    new_poly.lines.insert(j, l1)
-                    idx = new_poly.points.index(ln.point2)
-                    new_poly.points.insert(idx, pt)
-
-                    next_search.append(new_poly)
-                    if calculated_min is not None and constraint == MINIMIZE_PERIMETER:
-                        peri = new_poly.get_perimeter()
-                        # print(f"Peri: {peri} | Calculated: {calculated_min}")
-                        if peri > calculated_min:
-                            del next_search[-1]
-                            continue
-
-                    intersects = poly_utls.multiple_intersects_with_polygon([l1, l2], new_poly)
-                    if intersects:
-                        del next_search[-1]
+            for _, new_poly in iterate_children(search, problematic_pts, indexes, visited, calculated_min, constraint):
+                next_search.append(new_poly)
 
         current_search = next_search
 
@@ -319,6 +461,214 @@ def get_min_perimeter_include_exclude(points, calculated_min=None, constraint=MI
     return min_peri, min_peri_poly
 
 
+def get_min_include_exclude_best_first(points, calculated_min=None, constraint=MINIMIZE_PERIMETER):
+    """
+    Same search as get_min_perimeter_include_exclude, but the
+    polygons are taken from a priority queue (best first).
+
+    With MINIMIZE_PERIMETER, an insertion can only make the
+    perimeter longer, so the priority of a polygon is its perimeter
+    plus a lower bound of what is left: at least one of the
+    problematic points must be inserted in one of the lines, so the
+    smallest of these insertion costs is added (computed when the
+    polygon is taken from the queue, and the polygon goes back in the
+    queue if it is not the best anymore). The first valid polygon
+    taken from the queue is the best one.
+
+    The area can grow or shrink with an insertion, so there is no
+    lower bound for MINIMIZE_AREA: the polygons are taken by smallest
+    area (to find good polygons early) and all of them are tested.
+
+    :return: (smallest perimeter or area, polygon)
+    """
+
+    min_value = None
+    min_poly = None
+
+    hull = poly.Polygon()
+    hull.convex_hull(points)
+    hull.update_lines()
+
+    indexes = {pt: i for i, pt in enumerate(points)}
+    visited = set()
+
+    def get_value(polygon):
+        return polygon.get_perimeter() if constraint == MINIMIZE_PERIMETER else polygon.get_area()
+
+    # (priority, insertion number, polygon, problematic points or None if not computed)
+    queue = [(get_value(hull), 0, hull, None)]
+    nb_pushed = 1
+
+    while queue:
+        priority, order, search, problematic_pts = heapq.heappop(queue)
+        value = get_value(search)
+
+        if problematic_pts is None:
+            problematic_pts = get_problematic_points(points, search, constraint)
+
+            if constraint == MINIMIZE_PERIMETER and problematic_pts:
+                lower_bound = min(poly_optim.get_insertion_cost(pt, ln) for pt in problematic_pts for ln in search.lines)
+                priority = value + lower_bound
+
+                if calculated_min is not None and priority > calculated_min * (1 + BOUND_TOLERANCE):
+                    continue
+                if queue and priority > queue[0][0]:
+                    heapq.heappush(queue, (priority, order, search, problematic_pts))
+                    continue
+
+        if len(problematic_pts) == 0:
+            if min_value is None or value < min_value:
+                min_value = value
+                min_poly = search
+
+            if constraint == MINIMIZE_PERIMETER:
+                break
+            continue
+
+        for _, new_poly in iterate_children(search, problematic_pts, indexes, visited, calculated_min, constraint):
+            heapq.heappush(queue, (get_value(new_poly), nb_pushed, new_poly, None))
+            nb_pushed += 1
+
+    return min_value, min_poly
+
+
+def get_min_include_exclude_parallel(points, calculated_min=None, constraint=MINIMIZE_PERIMETER,
+                                     nb_threads=NUMBER_OF_THREADS):
+    """
+    Same search as get_min_perimeter_include_exclude (level by level),
+    but each level is split in chunks expanded by subprocesses.
+
+    The polygons are sent as cycles of point indexes (their keys),
+    the subprocesses already have the points. Under MINIMIZE_PERIMETER,
+    the best perimeter found is sent with each level, so the
+    subprocesses drop the polygons that are already longer.
+
+    :return: (smallest perimeter or area, polygon)
+    """
+
+    min_value = None
+    min_cycle = None
+
+    hull = poly.Polygon()
+    hull.convex_hull(points)
+
+    indexes = {pt: i for i, pt in enumerate(points)}
+    frontier = [get_cycle_key([indexes[pt] for pt in hull.points])]
+
+    memory = share_points(points)
+
+    try:
+        with Pool(nb_threads, initializer=attach_shared_points, initargs=(memory.name, len(points))) as pool:
+            i = 0
+            while frontier:
+                # The polygons are rebuilt from their keys, so their perimeters can differ by a rounding error
+                bound = calculated_min
+                if constraint == MINIMIZE_PERIMETER and min_value is not None:
+                    bound = min_value if bound is None else min(bound, min_value)
+                if bound is not None:
+                    bound *= 1 + BOUND_TOLERANCE
+
+                chunk_size = max(1, math.ceil(len(frontier) / (nb_threads * CHUNKS_PER_THREAD)))
+                tasks = [(frontier[start:start + chunk_size], bound, constraint)
+                         for start in range(0, len(frontier), chunk_size)]
+
+                next_frontier = []
+                visited = set()
+                for valid_cycles, children in pool.imap(expand_frontier_task_star, tasks):
+                    for value, cycle in valid_cycles:
+                        if min_value is None or value < min_value:
+                            min_value = value
+                            min_cycle = cycle
+
+                    for key in children:
+                        if key not in visited:
+                            visited.add(key)
+                            next_frontier.append(key)
+
+                frontier = next_frontier
+
+                print(f"Iteration {i + 1} | Current min: {min_value} u")
+                i += 1
+    finally:
+        memory.close()
+        memory.unlink()
+
+    if min_cycle is None:
+        return None, None
+
+    return min_value, poly.Polygon([points[i] for i in min_cycle], create_patch=False, update_bounds=False)
+
+
+def expand_frontier_task(cycles, bound, constraint=MINIMIZE_PERIMETER):
+    """
+    Expands a chunk of a level of get_min_include_exclude_parallel.
+
+    :return: (list of (value, cycle) of the valid polygons, list of the children's keys)
+    """
+
+    valid_cycles = []
+    children = []
+    visited = set()
+
+    for cycle in cycles:
+        search = poly.Polygon([worker_points[i] for i in cycle], create_patch=False, update_bounds=False)
+        problematic_pts = get_problematic_points(worker_points, search, constraint)
+
+        if len(problematic_pts) == 0:
+            value = search.get_perimeter() if constraint == MINIMIZE_PERIMETER else search.get_area()
+            valid_cycles.append((value, cycle))
+            continue
+
+        for key, _ in iterate_children(search, problematic_pts, worker_indexes, visited, bound, constraint):
+            children.append(key)
+
+    return valid_cycles, children
+
+
+def expand_frontier_task_star(task):
+    return expand_frontier_task(*task)
+
+
+def get_problematic_points(points, polygon, constraint=MINIMIZE_PERIMETER):
+    problematic_reds = poly_utls.get_included_excluded(points, polygon)
+    problematic_blues = poly_utls.get_excluded_included(points, polygon, constraint)
+    return problematic_reds + problematic_blues
+
+
+def iterate_children(search, problematic_pts, indexes, visited, calculated_min=None, constraint=MINIMIZE_PERIMETER):
+    """
+    Gives the polygons made by inserting one of the problematic
+    points in one of the lines of search, without intersections
+    and not already in visited, with their cycle keys.
+    """
+
+    search_cycle = [indexes[pt] for pt in search.points]
+    for pt in problematic_pts:
+        for j in range(len(search.lines)):
+            # The same polygon is made by inserting the points in other orders
+            key = get_cycle_key(search_cycle[:j + 1] + [indexes[pt]] + search_cycle[j + 1:])
+            if key in visited:
+                continue
+            visited.add(key)
+
+            new_poly = poly.Polygon(search.points.copy(), search.lines.copy(), create_patch=None, update_bounds=False)
+            # Insert the point pt at the position of the line
+            ln = search.lines[j]
+            l1 = poly.Line(ln.point1, pt)
+            l2 = poly.Line(pt, ln.point2)
+
+            new_poly.insert_point(ln, pt)
+
+            if calculated_min is not None and constraint == MINIMIZE_PERIMETER:
+                peri = new_poly.get_perimeter()
+                if peri > calculated_min:
+                    continue
+
+            intersects = poly_utls.multiple_intersects_with_polygon([l1, l2], new_poly)
+            if not intersects:
+                yield key, new_poly
+
+
 # def is_min_perimeter(current_perimeter, min_perimeter, points_in_line, current_point, all_points, is_end):
 #     print(current_perimeter)
 #     if current_point is None:
@@ -8,3 +8,13 @@ MINIMIZE_AREA = 1
 
 RESET_RANDOM = 0
 RESET_DATASET = 1
+
+HULL_AUTO = 0
+HULL_JARVIS = 1
+HULL_MONOTONE_CHAIN = 2
+HULL_NUMPY = 3
+
+STRATEGY_GREEDY = 0
+STRATEGY_NEAREST_EDGE = 1
+STRATEGY_RANDOMIZED = 2
+STRATEGY_REVERSED = 3
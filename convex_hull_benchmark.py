@@ -0,0 +1,62 @@
+import polygon_generator as poly_gen
+import polygon_optimization as poly_optim
+from constants import *
+import time
+import matplotlib.pyplot as plt
+
+"""
+This program compares the time taken by the convex hull
+methods (Jarvis' march, monotone chain and its numpy version)
+with multiple number of points, and checks that they all
+give the same polygon.
+"""
+
+iterations_per_num = 3
+num_points = [10, 100, 1000, 5000, 10000, 50000, 100000]
+jarvis_max_points = 10000  # The Jarvis' march is too long after this
+
+methods = {
+    "Jarvis": HULL_JARVIS,
+    "Monotone Chain": HULL_MONOTONE_CHAIN,
+    "Numpy": HULL_NUMPY
+}
+
+stats = {name: {} for name in methods}  # name: {num_points: average time}
+
+x_range = y_range = [-5, 5]
+
+for num in num_points:
+    print(f"Measuring convex hulls of {num} points.")
+    times = {name: [] for name in methods}
+
+    for i in range(iterations_per_num):
+        pts = poly_gen.get_random_points(i, num // 2, num // 2, x_range, y_range)
+
+        hulls = {}
+        for name, method in methods.items():
+            if method == HULL_JARVIS and num > jarvis_max_points:
+                continue
+
+            t = time.time()
+            hulls[name] = poly_optim.convex_hull(pts, method).points
+            times[name].append(time.time() - t)
+
+        if any(hull != hulls["Monotone Chain"] for hull in hulls.values()):
+            print("\tThe methods give different polygons!")
+
+    for name in methods:
+        if times[name]:
+            stats[name][num] = sum(times[name]) / len(times[name])
+            print(f"\t{name}: {stats[name][num]:.5f} secs")
+
+for name in methods:
+    plt.plot(list(stats[name].keys()), list(stats[name].values()))
+
+plt.xscale("log")
+plt.yscale("log")
+plt.grid()
+plt.title("Convex Hull Benchmark")
+
+plt.legend(list(methods.keys()))
+
+plt.show()
@@ -7,6 +7,7 @@ import polygon as poly
 import polygon_generator as poly_gen
 import polygon_optimization as poly_optim
 import interface_utilities as interface_utils
+import solution_cache
 
 from constants import *
 
@@ -59,6 +60,7 @@ class PolygonInterface:
         self.draggable_point_index = None
 
         self.step_delay = 0 #0.01
+        self.solution_cache = solution_cache.SolutionCache()
 
         self.fig = plt.figure(facecolor="#101010")
         self.fig.set_size_inches(10, 6, forward=True)
@@ -799,28 +801,41 @@ class PolygonInterface:
 
         if self.reset_mode == RESET_RANDOM or self.current_dataset is None:
             self.set_random_points()
+            self.initialize_polygon()
         else:
             self.load_dataset(self.current_dataset)
-        self.initialize_polygon()
+            # A reloaded dataset was often solved before
+            self.initialize_polygon(use_cache=True)
         self.update_graphics()
 
     def create_polygon(self):
         self.polygon = poly.Polygon()
         self.ax.add_patch(self.polygon.polygon_patch)
 
-    def initialize_polygon(self):
+    def initialize_polygon(self, use_cache=False):
         self.polygon.convex_hull(self.points)
         self.resize_limits()
 
         if self.auto_step:
-            self.step()
+            self.step(use_cache)
+        else:
+            self.polygon.update_patch_polygon()
 
-    def step(self):
+    def step(self, use_cache=False):
         """
         If auto step is activated, step until the polygon
         is completed, else step once.
+        With use_cache, a polygon already solved is taken
+        from the solution cache (not while dragging a point,
+        each position would be a new entry).
         """
 
+        if use_cache and self.auto_step and self.step_delay <= 0 and self.draggable_point is None:
+            self.polygon.max_optimize(self.points, update_bounds=False, update_patch=False,
+                                      constraint=self.constraint, cache=self.solution_cache)
+            self.update_graphics()
+            return
+
         while True:
             modified = self.polygon.optimize(self.points, update_bounds=False, update_patch=False, constraint=self.constraint)
 
@@ -1,10 +1,13 @@
 import math
 import random
+import time
+import numpy as np
 from matplotlib.patches import Polygon as PatchPolygon
 
 import polygon_utilities as poly_utls
 import polygon_generator as poly_gen
 import polygon_optimization as poly_optim
+import solution_cache
 
 from constants import *
 
@@ -12,11 +15,59 @@ INCLUDED = 0
 EXCLUDED = 1
 IGNORE = 2
 
+# Under this number of lines, testing all the lines is faster than using an EdgeGrid
+EDGE_GRID_MIN_LINES = 32
+
 
 class Polygon:
-    def __init__(self, points=None, lines=None, seed=None, create_patch=True, update_bounds=True):
-        self.points = points or []
-        self.lines = lines or []
+    """
+    The vertices are stored in a ring: each vertex knows the next
+    and the previous vertices, so a point is inserted or removed in
+    O(1). The lines are implicit (vertex -> next vertex). The points
+    and lines lists are only built when they are read, and kept
+    until the next modification.
+
+    Each modification of the vertices increments the version. The
+    bounds and the patch remember the version (and Point.moves) they
+    were computed for, so they are only computed again after a change.
+    """
+    def __init__(self, points=None, lines=None, seed=None, create_patch=True, update_bounds=True,
+                 point_set=None, order=None):
+        self.point_set = point_set
+        if point_set is not None and points is None:
+            if order is None:
+                order = range(len(point_set))
+            points = [point_set[i] for i in order]
+
+        self.first_vertex = None
+        self.next_vertex = {}  # vertex -> next vertex
+        self.previous_vertex = {}  # vertex -> previous vertex
+        self.vertex_lines = {}  # vertex -> Line(vertex, next vertex), created when needed
+        self.points_view = None
+        self.lines_view = None
+        self.version = 0
+
+        self.problematic_points = None  # ProblematicPointTracker kept between optimize() calls
+        self.insertion_costs = None  # InsertionCostTable kept between optimize() calls
+        self.edge_grid = None
+
+        # Running totals, updated at each insertion (valid while metrics_moves == Point.moves)
+        self.perimeter = 0
+        self.signed_area = 0
+        self.metrics_moves = None
+        self.vertex_bounds = None  # [x_min, y_min, x_max, y_max]
+        self.bounds_moves = None
+        self.bounds_view = [(0, 0), (0, 0)]  # [center, scale]
+        self.bounds_state = None
+        self.patch_state = None
+
+        if points:
+            self.points = points
+            if lines:
+                self.use_lines(lines)
+        elif lines:
+            self.lines = lines
+
         self.seed = seed or self.get_random_seed()
 
         if create_patch:
@@ -24,17 +75,95 @@ class Polygon:
         else:
             self.polygon_patch = None
 
-        self.bounds = [(0, 0), (0, 0)]  # [center, scale]
-
-        if self.points != [] and self.lines == []:
-            self.update_lines()
-
         if update_bounds:
             self.recalculate_bounds()
 
         if create_patch:
             self.update_patch_polygon()
 
+    @property
+    def points(self):
+        if self.points_view is None:
+            self.points_view = list(self.iterate_vertices())
+        return self.points_view
+
+    @points.setter
+    def points(self, points):
+        self.set_ring(points)
+
+    @property
+    def bounds(self):
+        self.recalculate_bounds()
+        return self.bounds_view
+
+    @property
+    def lines(self):
+        if self.lines_view is None:
+            if len(self.next_vertex) < 2:
+                self.lines_view = []
+            else:
+                self.lines_view = [self.get_line(pt) for pt in self.iterate_vertices()]
+        return self.lines_view
+
+    @lines.setter
+    def lines(self, lines):
+        self.set_ring([ln.point1 for ln in lines])
+        self.use_lines(lines)
+
+    def iterate_vertices(self):
+        if self.first_vertex is None:
+            return
+
+        pt = self.first_vertex
+        while True:
+            yield pt
+            pt = self.next_vertex[pt]
+            if pt is self.first_vertex:
+                break
+
+    def get_state(self):
+        # Changes when a vertex is added or removed, or when a point is moved
+        return self.version, Point.moves
+
+    def set_ring(self, points):
+        self.version += 1
+        self.reset_optimization_state()
+        self.first_vertex = points[0] if points else None
+        self.next_vertex = {}
+        self.previous_vertex = {}
+        self.vertex_lines = {}
+
+        for i, pt in enumerate(points):
+            next_pt = points[(i + 1) % len(points)]
+            self.next_vertex[pt] = next_pt
+            self.previous_vertex[next_pt] = pt
+
+        self.points_view = None
+        self.lines_view = None
+        self.metrics_moves = None
+        self.bounds_moves = None
+
+    def use_lines(self, lines):
+        # Keep the given Line objects for the lines of the ring
+        for ln in lines:
+            if self.next_vertex.get(ln.point1) is ln.point2:
+                self.vertex_lines[ln.point1] = ln
+        self.lines_view = None
+
+    def get_line(self, vertex):
+        """
+        Returns the line from vertex to the next vertex.
+        """
+
+        line = self.vertex_lines.get(vertex)
+        if line is None:
+            line = Line(vertex, self.next_vertex[vertex])
+            self.vertex_lines[vertex] = line
+        return line
+
+    def get_number_of_lines(self):
+        return len(self.next_vertex) if len(self.next_vertex) >= 2 else 0
+
     def get_random_seed(self):
         return random.randint(1, 1_000_000_000_000)
 
@@ -51,30 +180,75 @@ class Polygon:
         self.recalculate_bounds()
         self.update_patch_polygon()
 
-    def convex_hull(self, points):
-        self.set_points(poly_optim.convex_hull(points).points)
+    def convex_hull(self, points, method=HULL_AUTO):
+        hull = poly_optim.convex_hull(points, method)
+        self.point_set = points if isinstance(points, PointSet) else hull.point_set
+        self.set_points(hull.points)
+
+    def max_optimize(self, points, update_patch=True, update_bounds=True, constraint=MINIMIZE_PERIMETER,
+                     time_budget=None, max_steps=None, strategy=STRATEGY_GREEDY, rng=None, cache=None):
+        """
+        Optimizes until nothing changes, or until time_budget (seconds)
+        or max_steps is reached. Each step is a complete insertion, so
+        the polygon stays valid when it stops, and calling max_optimize
+        again continues from there.
+
+        With a SolutionCache, the polygon is taken from the cache when
+        the same points were already optimized from the same polygon,
+        and stored in it after a complete optimization.
+        """
+
+        start_time = time.perf_counter()
+        status = OptimizationStatus()
+
+        # The randomized strategies do not always give the same polygon
+        if strategy == STRATEGY_RANDOMIZED and rng is None:
+            rng = random.Random()
+
+        cache_key = None
+        if cache is not None and rng is None:
+            cache_key = cache.get_key(points, self, constraint, strategy)
+
+        order = cache.get(cache_key, len(points)) if cache_key is not None else None
+        if order is not None:
+            self.points = [points[i] for i in order]
+            status.completed = True
+            status.cached = True
+
+        while not status.completed:
+            if max_steps is not None and status.steps >= max_steps:
+                break
+            if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+                break
 
-    def max_optimize(self, points, update_patch=True, update_bounds=True, constraint=MINIMIZE_PERIMETER):
-        while True:
-            did_change = self.optimize(points, update_patch=False, update_bounds=False, constraint=constraint)
+            did_change = self.optimize(points, update_patch=False, update_bounds=False, constraint=constraint,
+                                       strategy=strategy, rng=rng)
             if not did_change:
+                status.completed = True
                 break
+            status.steps += 1
+
+        if cache_key is not None and status.completed and not status.cached:
+            cache.set(cache_key, solution_cache.get_vertex_indices(points, self))
+
+        status.problematic_points = len(self.get_problematic_points(points, constraint))
+        status.elapsed_time = time.perf_counter() - start_time
 
         if update_bounds:
             self.recalculate_bounds()
         if update_patch:
             self.update_patch_polygon()
 
-    def optimize(self, points, update_patch=True, update_bounds=True, constraint=MINIMIZE_PERIMETER):
-        did_change = False
-        included_excluded = poly_utls.get_included_excluded(points, self)
-        excluded_included = poly_utls.get_excluded_included(points, self, constraint)
+        return status
 
-        problematic_points = included_excluded + excluded_included
+    def optimize(self, points, update_patch=True, update_bounds=True, constraint=MINIMIZE_PERIMETER,
+                 strategy=STRATEGY_GREEDY, rng=None):
+        did_change = False
+        problematic_points = self.get_problematic_points(points, constraint)
 
         if problematic_points:
-            poly_optim.exclude_or_include_next(problematic_points, self, constraint=constraint)
-            did_change = True
+            did_change = poly_optim.exclude_or_include_next(problematic_points, self, constraint=constraint,
+                                                            strategy=strategy, rng=rng)
 
         if update_bounds:
             self.recalculate_bounds()
@@ -83,34 +257,182 @@ class Polygon:
 
         return did_change
 
-    def update_lines(self):
-        self.lines = []
+    def get_problematic_points(self, points, constraint=MINIMIZE_PERIMETER):
+        """
+        Returns the included-excluded and excluded-included points.
+        The classification is kept between calls and only updated
+        for the points affected by each insertion.
+        """
+
+        tracker = self.problematic_points
+        if tracker is None or not tracker.is_valid(points, constraint):
+            tracker = poly_optim.ProblematicPointTracker(points, self, constraint)
+            self.problematic_points = tracker
+
+        return tracker.get_problematic_points()
+
+    def get_insertion_costs(self, constraint=MINIMIZE_PERIMETER):
+        table = self.insertion_costs
+        if table is None or table.constraint != constraint or table.moves != Point.moves:
+            if constraint == MINIMIZE_AREA:
+                table = poly_optim.AreaInsertionTable(self, constraint)
+            else:
+                table = poly_optim.InsertionCostTable(self, constraint)
+            self.insertion_costs = table
+
+        return table
+
+    def reset_optimization_state(self):
+        # The structures kept between optimization steps are only valid for the same lines
+        self.problematic_points = None
+        self.insertion_costs = None
+        self.edge_grid = None
+
+    def insert_point(self, line, point):
+        """
+        Replace the line a -> b by the lines
+        a -> point and point -> b, in O(1).
+        """
+
+        self.version += 1
+        a, b = line.point1, line.point2
+        line1 = Line(a, point)
+        line2 = Line(point, b)
+
+        self.next_vertex[a] = point
+        self.previous_vertex[point] = a
+        self.next_vertex[point] = b
+        self.previous_vertex[b] = point
+        self.vertex_lines[a] = line1
+        self.vertex_lines[point] = line2
+
+        self.points_view = None
+        self.lines_view = None
+
+        if self.metrics_moves == Point.moves:
+            self.perimeter += line1.get_length() + line2.get_length() - line.get_length()
+            self.signed_area += get_triangle_signed_area(a, point, b)
+
+        if self.bounds_moves == Point.moves:
+            x_min, y_min, x_max, y_max = self.vertex_bounds
+            self.vertex_bounds = [min(x_min, point.x), min(y_min, point.y), max(x_max, point.x), max(y_max, point.y)]
+
+        if self.problematic_points is not None:
+            self.problematic_points.update(a, point, b)
+
+        if self.insertion_costs is not None:
+            self.insertion_costs.update(line, line1, line2, point)
+
+        # The cells of the old lines cannot be found again after a move
+        if self.edge_grid is not None and self.edge_grid.moves != Point.moves:
+            self.edge_grid = None
+
+        if self.edge_grid is not None:
+            self.edge_grid.remove(line)
+            self.edge_grid.add(line1)
+            self.edge_grid.add(line2)
+
+    def remove_point(self, point):
+        """
+        Replace the lines a -> point and point -> b
+        by the line a -> b, in O(1).
+        """
+
+        self.version += 1
+        a, b = self.previous_vertex.pop(point), self.next_vertex.pop(point)
+        removed_lines = [self.get_line(a), self.get_line(point)]
+        del self.vertex_lines[point]
+
+        if self.metrics_moves == Point.moves:
+            self.perimeter -= removed_lines[0].get_length() + removed_lines[1].get_length()
+            self.perimeter += poly_optim.distance(a, b)
+            self.signed_area -= get_triangle_signed_area(a, point, b)
+
+        # The bounds can only shrink if the point was on them
+        if self.bounds_moves == Point.moves:
+            x_min, y_min, x_max, y_max = self.vertex_bounds
+            if point.x in (x_min, x_max) or point.y in (y_min, y_max):
+                self.bounds_moves = None
+
+        if a is point:
+            self.first_vertex = None
+            self.metrics_moves = None
+        else:
+            self.next_vertex[a] = b
+            self.previous_vertex[b] = a
+            self.vertex_lines[a] = Line(a, b)
+            if self.first_vertex is point:
+                self.first_vertex = b
 
-        if len(self.points) < 2:
-            return
+        self.points_view = None
+        self.lines_view = None
 
-        last_point = None
-        for pt in self.points:
-            if last_point is not None:
-                ln = Line(last_point, pt)
-                self.lines.append(ln)
-            last_point = pt
+        # The removed point is not a vertex anymore, the classification starts again
+        self.problematic_points = None
+        self.insertion_costs = None
+
+        if self.edge_grid is not None and self.edge_grid.moves != Point.moves:
+            self.edge_grid = None
+
+        if self.edge_grid is not None:
+            for line in removed_lines:
+                self.edge_grid.remove(line)
+            if a is not point:
+                self.edge_grid.add(self.vertex_lines[a])
+
+    def get_edge_grid(self):
+        """
+        Returns the spatial index of the lines, or None if the
+        polygon is small enough to test all its lines.
+        The grid is rebuilt when the polygon got much bigger
+        than when the cells size was chosen, or when a point moved.
+        """
+
+        nb_lines = self.get_number_of_lines()
+        if nb_lines < EDGE_GRID_MIN_LINES:
+            return None
+
+        if self.edge_grid is None or nb_lines > 4 * self.edge_grid.initial_size or \
+                self.edge_grid.moves != Point.moves:
+            self.edge_grid = EdgeGrid(self.lines)
+
+        return self.edge_grid
+
+    def has_vertex(self, point):
+        return point in self.next_vertex
 
-        if len(self.points) >= 2:
-            self.lines.append(
-                Line(self.points[-1], self.points[0])
-            )
+    def update_lines(self):
+        # New Line objects for all the vertices
+        self.version += 1
+        self.reset_optimization_state()
+        self.vertex_lines = {}
+        self.lines_view = None
 
     def update_points(self):
-        self.points = []
-        for line in self.lines:
-            self.points.append(line.point1)
+        # The points and lines are always built from the same ring
+        self.version += 1
+        self.reset_optimization_state()
+        self.points_view = None
 
     def get_area(self):
-        return poly_utls.calculate_area(self)
+        if self.metrics_moves != Point.moves:
+            self.recalculate_metrics()
+        return abs(self.signed_area)
 
     def get_perimeter(self):
-        return poly_utls.calculate_perimeter(self)
+        if self.metrics_moves != Point.moves:
+            self.recalculate_metrics()
+        return self.perimeter
+
+    def recalculate_metrics(self):
+        """
+        Full computation of the running perimeter and area.
+        Also used to verify the running totals.
+        """
+
+        self.perimeter = poly_utls.calculate_perimeter(self)
+        self.signed_area = poly_utls.calculate_signed_area(self)
+        self.metrics_moves = Point.moves
 
     def point_in_polygon(self, point):
         return poly_utls.point_in_polygon(point, self)
@@ -119,11 +441,34 @@ class Polygon:
         return poly_utls.point_to_line_distance(point, line)
 
     def recalculate_bounds(self):
-        self.bounds = poly_utls.calculate_bounds(self)
+        state = self.get_state()
+        if self.bounds_state == state:
+            return
+        self.bounds_state = state
+
+        if self.bounds_moves != Point.moves:
+            x_bounds, y_bounds = poly_utls.calculate_extremums(self)
+            self.vertex_bounds = [x_bounds[0], y_bounds[0], x_bounds[1], y_bounds[1]]
+            self.bounds_moves = Point.moves
+
+        if not self.next_vertex:
+            self.bounds_view = [(0, 0), (0, 0)]
+            return
+
+        x_min, y_min, x_max, y_max = self.vertex_bounds
+        x_size = x_max - x_min
+        y_size = y_max - y_min
+        self.bounds_view = [
+            (x_min + x_size / 2, y_min + y_size / 2),
+            (x_size, y_size)
+        ]
 
     def update_patch_polygon(self):
         if self.polygon_patch is None:
             self.polygon_patch = PatchPolygon([(0, 0)], closed=True, fill=True, facecolor="#101010", edgecolor='white', linewidth=2)
+        elif self.patch_state == self.get_state():
+            return
+        self.patch_state = self.get_state()
 
         vertices = []
         for pt in self.points:
@@ -135,10 +480,136 @@ class Polygon:
         self.polygon_patch.set_xy(vertices)
 
     def set_points(self, points):
+        # The bounds and the patch are computed when they are needed
         self.points = points
-        self.update_lines()
-        self.recalculate_bounds()
-        self.update_patch_polygon()
+
+    def get_vertex_order(self):
+        """
+        Returns the indices (in self.point_set) of the polygon's
+        vertices, in order, or None if the polygon is not entirely
+        made of views of its point set.
+        """
+
+        if self.point_set is None:
+            return None
+
+        order = np.empty(len(self.next_vertex), dtype=np.intp)
+        for i, pt in enumerate(self.iterate_vertices()):
+            if not isinstance(pt, PointView) or pt.point_set is not self.point_set:
+                return None
+            order[i] = pt.index
+
+        return order
+
+
+class OptimizationStatus:
+    """
+    Returned by Polygon.max_optimize. completed is True when no other
+    point could be included or excluded (the problematic points left
+    cannot be fixed), and False when the time or step limit stopped it.
+    cached is True when the polygon was taken from a SolutionCache.
+    """
+    def __init__(self, steps=0, problematic_points=0, elapsed_time=0, completed=False, cached=False):
+        self.steps = steps
+        self.problematic_points = problematic_points
+        self.elapsed_time = elapsed_time
+        self.completed = completed
+        self.cached = cached
+
+    def __str__(self):
+        return f"OptimizationStatus(steps={self.steps}, problematic_points={self.problematic_points}, " \
+               f"elapsed_time={self.elapsed_time:.3f}, completed={self.completed}, cached={self.cached})"
+
+
+def get_triangle_signed_area(a, p, b):
+    """
+    Area added to the polygon's signed area when the point p
+    is inserted between a and b (shoelace terms).
+    """
+
+    return ((a.x * p.y - p.x * a.y) + (p.x * b.y - b.x * p.y) - (a.x * b.y - b.x * a.y)) / 2
+
+
+class EdgeGrid:
+    """
+    Uniform grid storing each line in all the cells it crosses.
+    Two lines can only intersect in a cell they both cross, so
+    an intersection test only needs the lines of these cells.
+    """
+    def __init__(self, lines, cell_size=None):
+        self.initial_size = len(lines)
+        self.moves = Point.moves  # The cells are outdated when a point is moved
+
+        if cell_size is None:
+            xs = [ln.point1.x for ln in lines] + [ln.point2.x for ln in lines]
+            ys = [ln.point1.y for ln in lines] + [ln.point2.y for ln in lines]
+            size = max(max(xs) - min(xs), max(ys) - min(ys)) if lines else 0
+            cell_size = size / math.sqrt(len(lines)) if size > 0 else 1
+
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> {line: None}, used as an ordered set
+
+        for line in lines:
+            self.add(line)
+
+    def get_cells(self, line):
+        """
+        All the cells crossed by the line. The line is cut in
+        columns and, in each column, the rows between the two
+        heights of the line are taken (with a small margin for
+        rounding errors).
+        """
+
+        x1, y1 = line.point1.x, line.point1.y
+        x2, y2 = line.point2.x, line.point2.y
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+
+        size = self.cell_size
+        margin = size * 1e-9
+
+        for column in range(math.floor((x1 - margin) / size), math.floor((x2 + margin) / size) + 1):
+            if x1 == x2:
+                start_y, end_y = y1, y2
+            else:
+                slope = (y2 - y1) / (x2 - x1)
+                start_y = y1 + (max(x1, column * size) - x1) * slope
+                end_y = y1 + (min(x2, (column + 1) * size) - x1) * slope
+
+            low, high = min(start_y, end_y) - margin, max(start_y, end_y) + margin
+            for row in range(math.floor(low / size), math.floor(high / size) + 1):
+                yield column, row
+
+    def add(self, line):
+        for cell in self.get_cells(line):
+            self.cells.setdefault(cell, {})[line] = None
+
+    def remove(self, line):
+        for cell in self.get_cells(line):
+            cell_lines = self.cells.get(cell)
+            if cell_lines is not None:
+                cell_lines.pop(line, None)
+                if not cell_lines:
+                    del self.cells[cell]
+
+    def intersects(self, lines):
+        """
+        Returns True as soon as one of the lines intersects
+        with a line of the grid.
+        """
+
+        for line in lines:
+            tested = set()
+            for cell in self.get_cells(line):
+                for other in self.cells.get(cell, ()):
+                    if other in tested:
+                        continue
+                    tested.add(other)
+
+                    if poly_utls.intersects_with_line(line, other):
+                        return True
+
+        return False
 
 
 class Point:
@@ -146,35 +617,142 @@ class Point:
     Helper class to store each coordinate point and
     its state (included or excluded).
     """
+    __slots__ = ("x", "y", "state")
+
+    # Incremented each time a point is moved (or changes state), so the caches know they are outdated
+    moves = 0
+
     def __init__(self, x, y, state=INCLUDED):
-        self.x = x
-        self.y = y
-        self.state = state
+        # A new point is in no line yet, so it is not counted as a move
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "y", y)
+        object.__setattr__(self, "state", state)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name == "x" or name == "y" or name == "state":
+            Point.moves += 1
 
     def __str__(self):
         return f"({self.x}, {self.y})"
 
 
+class PointSet:
+    """
+    Array-backed dataset (struct of arrays).
+    The coordinates are stored in contiguous float64 arrays and
+    the states in an uint8 array, which is much lighter than a list
+    of Point objects for big datasets. The Point objects given by
+    the set are views on these arrays: once a view is created, its
+    point should be modified through the view, not the arrays.
+    """
+    def __init__(self, x=None, y=None, states=None):
+        self.x = np.ascontiguousarray(x if x is not None else [], dtype=np.float64)
+        self.y = np.ascontiguousarray(y if y is not None else [], dtype=np.float64)
+
+        if states is None:
+            states = np.full(len(self.x), INCLUDED)
+        self.states = np.ascontiguousarray(states, dtype=np.uint8)
+
+        if not len(self.x) == len(self.y) == len(self.states):
+            raise ValueError("The x, y and states arrays must have the same length.")
+
+        # Views are created when needed, and kept so a point always keeps its identity
+        self.views = [None] * len(self.x)
+
+    @classmethod
+    def from_points(cls, points):
+        x = np.fromiter((pt.x for pt in points), dtype=np.float64, count=len(points))
+        y = np.fromiter((pt.y for pt in points), dtype=np.float64, count=len(points))
+        states = np.fromiter((pt.state for pt in points), dtype=np.uint8, count=len(points))
+        return cls(x, y, states)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index):
+        view = self.views[index]
+        if view is None:
+            view = PointView(self, int(index))
+            self.views[index] = view
+        return view
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_points(self):
+        return list(self)
+
+
+class PointView(Point):
+    """
+    Point stored in a PointSet. Its coordinates and state are
+    copied from the set's arrays when the view is created, so
+    reading them is as fast as for a Point, and modifying them
+    also modifies the set's arrays.
+    """
+    __slots__ = ("point_set", "index")
+
+    def __init__(self, point_set, index):
+        object.__setattr__(self, "point_set", point_set)
+        object.__setattr__(self, "index", index)
+        super().__init__(float(point_set.x[index]), float(point_set.y[index]), int(point_set.states[index]))
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "x":
+            self.point_set.x[self.index] = value
+        elif name == "y":
+            self.point_set.y[self.index] = value
+        elif name == "state":
+            self.point_set.states[self.index] = value
+
+
 class Line:
     """
     Helper class to store a vertex (line) between two points.
     Some functions to get the lengths and directions.
+
+    The length, direction and bounding box are computed once, and
+    computed again only if a point was moved since.
     """
+    __slots__ = ("point1", "point2", "cache_moves", "length", "direction", "bounding_box")
+
     def __init__(self, point1, point2):
         self.point1 = point1
         self.point2 = point2
+        self.cache_moves = -1
 
     def get_dx(self): return self.point1.x - self.point2.x
     def get_dy(self): return self.point1.y - self.point2.y
 
+    def update_cache(self):
+        p1, p2 = self.point1, self.point2
+        self.length = math.sqrt(self.get_dx() ** 2 + self.get_dy() ** 2)
+        self.direction = None
+        self.bounding_box = (min(p1.x, p2.x), min(p1.y, p2.y), max(p1.x, p2.x), max(p1.y, p2.y))
+        self.cache_moves = Point.moves
+
     def get_length(self):
-        return math.sqrt(self.get_dx() ** 2 + self.get_dy() ** 2)
+        if self.cache_moves != Point.moves:
+            self.update_cache()
+        return self.length
 
     def get_direction(self):
-        normalization = 1 / self.get_length()
-        dir_x = normalization * self.get_dx()
-        dir_y = normalization * self.get_dy()
-        return [dir_x, dir_y]
+        if self.cache_moves != Point.moves:
+            self.update_cache()
+
+        if self.direction is None:
+            normalization = 1 / self.length
+            self.direction = [normalization * self.get_dx(), normalization * self.get_dy()]
+        return self.direction
+
+    def get_bounding_box(self):
+        # (x_min, y_min, x_max, y_max)
+        if self.cache_moves != Point.moves:
+            self.update_cache()
+        return self.bounding_box
 
     def __str__(self):
         return f"({self.point1} -> {self.point2})"
@@ -1,8 +1,84 @@
 from opensimplex import OpenSimplex
+from functools import lru_cache
+import numpy as np
 import math
 import polygon as poly
 import random
 
+# Number of noise generators kept (one per seed)
+NOISE_CACHE_SIZE = 256
+
+# Number of points in each PointSet given by iterate_random_point_sets
+RANDOM_POINTS_CHUNK_SIZE = 1 << 20
+
+# OpenSimplex 2D constants (from Kurt Spencer's OpenSimplex noise)
+STRETCH_CONSTANT2 = -0.211324865405187  # (1 / sqrt(2 + 1) - 1) / 2
+SQUISH_CONSTANT2 = 0.366025403784439  # (sqrt(2 + 1) - 1) / 2
+NORM_CONSTANT2 = 47
+GRADIENTS2 = np.array([5, 2, 2, 5, -5, 2, -2, 5, 5, -2, 2, -5, -5, -2, -2, -5], dtype=np.int64)
+
+# Seeds and coordinates where noise2_along is compared with OpenSimplex.noise2
+NOISE_CHECK_SEEDS = [0, 1, -7, 123456789, 1 << 40]
+NOISE_CHECK_X = np.linspace(-9.7, 9.3, 16)
+NOISE_CHECK_Y = np.cos(np.arange(16)) * 9.1
+
+
+@lru_cache(maxsize=NOISE_CACHE_SIZE)
+def get_noise(seed):
+    """
+    Noise of the seed, as (OpenSimplex object, permutation table).
+    When noise2_along gives the same values as the installed
+    opensimplex, only the permutation table (for noise2_along) is
+    made, else only the OpenSimplex object (for noise2).
+
+    The generators of the last seeds are kept.
+    """
+
+    if is_noise2_along_valid():
+        return None, get_permutation(seed)
+    return OpenSimplex(seed), None
+
+
+@lru_cache(maxsize=1)
+def is_noise2_along_valid():
+    """
+    Checks once that noise2_along (and get_permutation) gives
+    exactly the values of OpenSimplex.noise2, so another version
+    of opensimplex cannot silently change the shapes.
+    """
+
+    for seed in NOISE_CHECK_SEEDS:
+        noise = OpenSimplex(seed)
+        expected = [noise.noise2(x, y) for x, y in zip(NOISE_CHECK_X.tolist(), NOISE_CHECK_Y.tolist())]
+        if noise2_along(get_permutation(seed), NOISE_CHECK_X, NOISE_CHECK_Y).tolist() != expected:
+            return False
+
+    return True
+
+
+def get_permutation(seed):
+    """
+    Permutation table of the OpenSimplex noise, made from the
+    seed with a 64 bits linear congruential generator.
+    """
+
+    def next_seed(value):
+        value = value * 6364136223846793005 + 1442695040888963407
+        return (value + (1 << 63)) % (1 << 64) - (1 << 63)  # Overflow like a 64 bits integer
+
+    for _ in range(3):
+        seed = next_seed(seed)
+
+    perm = np.zeros(256, dtype=np.int64)
+    source = list(range(256))
+    for i in range(255, -1, -1):
+        seed = next_seed(seed)
+        r = (seed + 31) % (i + 1)
+        perm[i] = source[r]
+        source[r] = source[i]
+
+    return perm
+
 
 def generate_polygon_points(seed, center, scale, smoothness=1):
     """
@@ -10,29 +86,111 @@ def generate_polygon_points(seed, center, scale, smoothness=1):
     to create a natural-like shape around a center.
     """
 
-    points = []
-    noise = OpenSimplex(seed)
-
     num_points = math.ceil(scale * 10)
+    if num_points <= 0:
+        return []
+
+    noise, perm = get_noise(seed)
+
     base_radius = scale
     frequency = scale
 
-    angle = 0
-    for n in range(num_points):
-        noise_value = noise.noise2(
-            math.cos(angle) * frequency,
-            math.sin(angle) * frequency
-        )
+    # The angles are added one after the other, like in a loop (same rounding)
+    angles = np.zeros(num_points)
+    angles[1:] = np.cumsum(np.full(num_points - 1, 2 * math.pi / num_points))
+    cos = np.array([math.cos(angle) for angle in angles])
+    sin = np.array([math.sin(angle) for angle in angles])
+
+    if perm is not None:
+        noise_values = noise2_along(perm, cos * frequency, sin * frequency)
+    else:
+        noise_values = np.array([noise.noise2(x, y) for x, y in zip((cos * frequency).tolist(),
+                                                                     (sin * frequency).tolist())])
+
+    radius = base_radius + (1 / smoothness) * noise_values
+    xs = (radius * cos).tolist()
+    ys = (radius * sin).tolist()
 
-        radius = base_radius + (1 / smoothness) * noise_value
-        x = radius * math.cos(angle)
-        y = radius * math.sin(angle)
-        point = poly.Point(x, y, poly.INCLUDED)
-        points.append(point)
+    return [poly.Point(x, y, poly.INCLUDED) for x, y in zip(xs, ys)]
+
+
+def noise2_along(perm, x, y):
+    """
+    OpenSimplex 2D noise of (x[i], y[i]) for all i at once, with the
+    permutation table perm (the library's noise2array gives the noise
+    of the whole grid x * y instead).
+    """
 
-        angle += 2 * math.pi / num_points
+    def extrapolate(xsb, ysb, dx, dy):
+        index = perm[(perm[xsb & 0xFF] + ysb) & 0xFF] & 0x0E
+        return GRADIENTS2[index] * dx + GRADIENTS2[index + 1] * dy
 
-    return points
+    def contribution(xsb, ysb, dx, dy):
+        attn = 2 - dx * dx - dy * dy
+        positive = attn > 0
+        attn = attn * attn
+        return np.where(positive, attn * attn * extrapolate(xsb, ysb, dx, dy), 0)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Place input coordinates onto grid
+    stretch_offset = (x + y) * STRETCH_CONSTANT2
+    xs = x + stretch_offset
+    ys = y + stretch_offset
+
+    # Grid coordinates of rhombus (stretched square) super-cell origin
+    xsb = np.floor(xs).astype(np.int64)
+    ysb = np.floor(ys).astype(np.int64)
+
+    squish_offset = (xsb + ysb) * SQUISH_CONSTANT2
+    xb = xsb + squish_offset
+    yb = ysb + squish_offset
+
+    xins = xs - xsb
+    yins = ys - ysb
+    in_sum = xins + yins
+
+    dx0 = x - xb
+    dy0 = y - yb
+
+    value = np.zeros(len(x))
+    value += contribution(xsb + 1, ysb + 0, dx0 - 1 - SQUISH_CONSTANT2, dy0 - 0 - SQUISH_CONSTANT2)
+    value += contribution(xsb + 0, ysb + 1, dx0 - 0 - SQUISH_CONSTANT2, dy0 - 1 - SQUISH_CONSTANT2)
+
+    # Extra vertex, inside the triangle (2-Simplex) at (0, 0)
+    zins = 1 - in_sum
+    closest = (zins > xins) | (zins > yins)
+    x_side = xins > yins
+    xsv_low = np.where(closest, np.where(x_side, xsb + 1, xsb - 1), xsb + 1)
+    ysv_low = np.where(closest, np.where(x_side, ysb - 1, ysb + 1), ysb + 1)
+    dx_low = np.where(closest, np.where(x_side, dx0 - 1, dx0 + 1), dx0 - 1 - 2 * SQUISH_CONSTANT2)
+    dy_low = np.where(closest, np.where(x_side, dy0 + 1, dy0 - 1), dy0 - 1 - 2 * SQUISH_CONSTANT2)
+
+    # Extra vertex, inside the triangle (2-Simplex) at (1, 1)
+    zins = 2 - in_sum
+    closest = (zins < xins) | (zins < yins)
+    xsv_high = np.where(closest, np.where(x_side, xsb + 2, xsb + 0), xsb)
+    ysv_high = np.where(closest, np.where(x_side, ysb + 0, ysb + 2), ysb)
+    dx_high = np.where(closest, np.where(x_side, dx0 - 2 - 2 * SQUISH_CONSTANT2, dx0 + 0 - 2 * SQUISH_CONSTANT2), dx0)
+    dy_high = np.where(closest, np.where(x_side, dy0 + 0 - 2 * SQUISH_CONSTANT2, dy0 - 2 - 2 * SQUISH_CONSTANT2), dy0)
+
+    low = in_sum <= 1
+    xsv_ext = np.where(low, xsv_low, xsv_high)
+    ysv_ext = np.where(low, ysv_low, ysv_high)
+    dx_ext = np.where(low, dx_low, dx_high)
+    dy_ext = np.where(low, dy_low, dy_high)
+
+    # Contribution (0, 0) or (1, 1)
+    xsb = np.where(low, xsb, xsb + 1)
+    ysb = np.where(low, ysb, ysb + 1)
+    dx0 = np.where(low, dx0, dx0 - 1 - 2 * SQUISH_CONSTANT2)
+    dy0 = np.where(low, dy0, dy0 - 1 - 2 * SQUISH_CONSTANT2)
+
+    value += contribution(xsb, ysb, dx0, dy0)
+    value += contribution(xsv_ext, ysv_ext, dx_ext, dy_ext)
+
+    return value / NORM_CONSTANT2
 
 
 def get_random_points(seed, included_pts=10, excluded_pts=10, x_range=None, y_range=None):
@@ -40,21 +198,63 @@ def get_random_points(seed, included_pts=10, excluded_pts=10, x_range=None, y_ra
     Simple function giving a list of point with a few restrictions
     like the number of point and the coordinate range, as well
     as the specification of a seed.
+
+    The points are given by their own random.Random, so the global
+    random module is not touched (the points are the same as with
+    random.seed(seed)).
     """
 
     x_range = x_range or [0, 1]
     y_range = y_range or [0, 1]
 
-    random.seed(seed)
+    rng = random.Random(seed)
 
     pts = []
     for i in range(included_pts + excluded_pts):
         state = poly.INCLUDED if i < included_pts else poly.EXCLUDED
-        x = random.uniform(*x_range)
-        y = random.uniform(*y_range)
+        x = rng.uniform(*x_range)
+        y = rng.uniform(*y_range)
         pt = poly.Point(x, y, state)
         pts.append(pt)
 
-    random.seed()
-
     return pts
+
+
+def get_random_point_set(seed, included_pts=10, excluded_pts=10, x_range=None, y_range=None):
+    """
+    Same as get_random_points, for big datasets: all the points
+    are created at once in a PointSet, with a numpy Generator
+    (the points are not the same as get_random_points for a seed).
+    """
+
+    chunk_size = max(included_pts + excluded_pts, 1)
+    for point_set in iterate_random_point_sets(seed, included_pts, excluded_pts, x_range, y_range, chunk_size):
+        return point_set
+
+    return poly.PointSet()
+
+
+def iterate_random_point_sets(seed, included_pts=10, excluded_pts=10, x_range=None, y_range=None,
+                              chunk_size=RANDOM_POINTS_CHUNK_SIZE):
+    """
+    Gives the points of get_random_point_set in PointSets of at most
+    chunk_size points, so the whole dataset is never in memory.
+    The points are the same for any chunk size.
+    """
+
+    x_range = x_range or [0, 1]
+    y_range = y_range or [0, 1]
+
+    rng = np.random.default_rng(seed)
+    low = [x_range[0], y_range[0]]
+    high = [x_range[1], y_range[1]]
+
+    num_points = included_pts + excluded_pts
+    for start in range(0, num_points, chunk_size):
+        size = min(chunk_size, num_points - start)
+
+        # (x, y) pairs, so the numbers are drawn in the same order for any chunk size
+        coordinates = rng.uniform(low, high, size=(size, 2))
+        states = np.where(np.arange(start, start + size) < included_pts, poly.INCLUDED, poly.EXCLUDED)
+
+        yield poly.PointSet(coordinates[:, 0], coordinates[:, 1], states)
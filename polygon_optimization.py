@@ -1,10 +1,20 @@
 import math
+import heapq
+import random
+import numpy as np
 import polygon as poly
 import polygon_utilities as poly_utils
 from constants import *
 
+# From this number of included points, HULL_AUTO uses the numpy convex hull
+NUMPY_HULL_MIN_POINTS = 500
 
-def exclude_or_include_next(points, polygon, constraint=MINIMIZE_PERIMETER):
+# With STRATEGY_RANDOMIZED, the costs are randomly worsened by up to 5%,
+# so points with close costs are taken in a random order
+RANDOMIZED_COST_TOLERANCE = 0.05
+
+
+def exclude_or_include_next(points, polygon, constraint=MINIMIZE_PERIMETER, strategy=STRATEGY_GREEDY, rng=None):
     """
     Main focus of our algorithm.
     The goal (to minimize the perimeter), is to take the
@@ -16,55 +26,45 @@ def exclude_or_include_next(points, polygon, constraint=MINIMIZE_PERIMETER):
 
     Then, connect it to the polygon.
 
+    The best line of each point is kept by the polygon's
+    InsertionCostTable, and the points are taken from a priority
+    queue. When an insertion would intersect the polygon, only the
+    rejected point's next best line is searched.
+
+    Other strategies only change the order in which the points are
+    taken (each point still goes in its best line):
+    STRATEGY_NEAREST_EDGE takes the point nearest to its line first,
+    and STRATEGY_RANDOMIZED takes points with close costs in a random
+    order.
+
     :param points: Problematic points that needs inclusion/exclusion
     :param polygon: Current polygon
     :param constraint: Minimization parameter (perimeter or area)
+    :param strategy: Order of the points (STRATEGY_GREEDY by default)
+    :param rng: random.Random used by STRATEGY_RANDOMIZED (a new one by default)
+    :return: True if a point was inserted
     """
 
     if not points:
-        return
+        return False
 
-    pt_line_excluded = []
+    if strategy == STRATEGY_RANDOMIZED and rng is None:
+        rng = random.Random()
 
-    left_pts = points.copy()
-    while True:
-        longest_distance = None
-        selected_point = None
-        selected_line_index = None
-        for point in left_pts:
-            local_shortest = None
-            local_selected_line_i = None
-            for i, line in enumerate(polygon.lines):
-                if [point, line] in pt_line_excluded:
-                    continue
-
-                #dist = polygon.point_to_line_distance(point, line)
-                if constraint == MINIMIZE_PERIMETER:
-                    l1 = poly.Line(line.point1, point)
-                    l2 = poly.Line(point, line.point2)
-
-                    start_dist = line.get_length()
-                    new_dist = l1.get_length() + l2.get_length()
-                    dist = new_dist - start_dist
-                    dist = dist
-                else:
-                    # Form a triangle
-                    l1 = poly.Line(line.point2, point)
-                    l2 = poly.Line(point, line.point1)
-
-                    dist = poly_utils.calculate_lines_area([line, l1, l2])
-                    dist *= -1  # Find the biggest area
-
-                if local_shortest is None or local_shortest >= dist:
-                    local_shortest = dist
-                    local_selected_line_i = i
-
-            if longest_distance is None or longest_distance <= local_shortest:
-                longest_distance = local_shortest
-                selected_point = point
-                selected_line_index = local_selected_line_i
-
-        line = polygon.lines[selected_line_index]
+    costs = polygon.get_insertion_costs(constraint)
+
+    # On equal costs, the last point (and line) is taken
+    queue = []
+    for rank, point in enumerate(points):
+        cost, line = costs.add(point)
+        if line is not None:
+            queue.append((get_priority(point, cost, line, strategy, rng), -rank, line))
+    heapq.heapify(queue)
+
+    pt_line_excluded = {}  # point -> set of lines
+    while queue:
+        _, rank, line = heapq.heappop(queue)
+        selected_point = points[-rank]
 
         line1 = poly.Line(line.point1, selected_point)
         line2 = poly.Line(selected_point, line.point2)
@@ -72,23 +72,321 @@ def exclude_or_include_next(points, polygon, constraint=MINIMIZE_PERIMETER):
         intersects = poly_utils.multiple_intersects_with_polygon([line1, line2], polygon)
 
         if not intersects:
-            del polygon.lines[selected_line_index]
-            polygon.lines.insert(selected_line_index, line2)
-            polygon.lines.insert(selected_line_index, line1)
-            idx = polygon.points.index(line.point2)
-            polygon.points.insert(idx, selected_point)
-            break
-        else:
-            pt_line_excluded.append([selected_point, line])
+            polygon.insert_point(line, selected_point)
+            return True
+
+        excluded_lines = pt_line_excluded.setdefault(selected_point, set())
+        excluded_lines.add(line)
+        cost, line = costs.get_best_line(selected_point, excluded_lines)
+        if line is not None:
+            heapq.heappush(queue, (get_priority(selected_point, cost, line, strategy, rng), rank, line))
+
+    return False
+
+
+def get_priority(point, cost, line, strategy=STRATEGY_GREEDY, rng=None):
+    """
+    Priority of the point in exclude_or_include_next's queue
+    (the smallest is taken first).
+    """
+
+    if strategy == STRATEGY_NEAREST_EDGE:
+        return poly_utils.point_to_line_distance(point, line)
+    if strategy == STRATEGY_RANDOMIZED:
+        return -cost + abs(cost) * RANDOMIZED_COST_TOLERANCE * rng.random()
+    return -cost
+
+
+def get_insertion_cost(point, line, constraint=MINIMIZE_PERIMETER):
+    """
+    Cost of inserting the point in the line:
+    the perimeter added, or the opposite of the triangle's
+    area (to find the biggest area).
+    """
+
+    a, b = line.point1, line.point2
+
+    if constraint == MINIMIZE_PERIMETER:
+        start_dist = line.get_length()
+        new_dist = math.sqrt((a.x - point.x) ** 2 + (a.y - point.y) ** 2) + \
+            math.sqrt((point.x - b.x) ** 2 + (point.y - b.y) ** 2)
+        return new_dist - start_dist
 
+    # Form a triangle (shoelace formula on a -> b, b -> point and point -> a)
+    total_area = (a.x * b.y - b.x * a.y) + (b.x * point.y - point.x * b.y) + (point.x * a.y - a.x * point.y)
+    return -abs(total_area / 2)
 
-def convex_hull(points):
+
+class InsertionCostTable:
+    """
+    Keeps, for each problematic point, the line where its
+    insertion costs the least.
+
+    The cost of a point in a line never changes, so after an
+    insertion (a -> b replaced by a -> p and p -> b), only the two
+    new lines are evaluated for each point. The points whose best
+    line was a -> b are the only ones to search again in all lines.
+
+    When lines of a point are rejected (the insertion intersects the
+    polygon), the point's lines are sorted once, and the next best
+    line is the next one in this order, until the polygon changes.
+    """
+
+    def __init__(self, polygon, constraint=MINIMIZE_PERIMETER):
+        self.polygon = polygon
+        self.constraint = constraint
+        self.moves = poly.Point.moves  # The costs are outdated when a point is moved
+
+        self.best = {}  # point -> (cost, line)
+        self.points_by_line = {}  # line -> {point: None}, the points having this best line
+
+        self.lines = None
+        self.rankings = {}  # point -> [costs, lines sorted by cost, position of the next line]
+
+    def get_lines(self):
+        # The rankings are only valid for the same lines
+        lines = self.polygon.lines
+        if lines is not self.lines:
+            self.lines = lines
+            self.rankings = {}
+        return lines
+
+    def get_costs(self, point):
+        return np.array([get_insertion_cost(point, line, self.constraint) for line in self.get_lines()],
+                        dtype=np.float64)
+
+    def search_best_line(self, point):
+        """
+        Search the best line in all the polygon's lines
+        (the last one on equal costs).
+        """
+
+        best_cost = None
+        best_line = None
+        for line in self.get_lines():
+            cost = get_insertion_cost(point, line, self.constraint)
+            if best_cost is None or best_cost >= cost:
+                best_cost = cost
+                best_line = line
+
+        return best_cost, best_line
+
+    def get_best_line(self, point, excluded_lines=None):
+        """
+        Best line of the point that is not in excluded_lines.
+        :return: (cost, line), or (None, None) if there is no line
+        """
+
+        if not excluded_lines:
+            return self.search_best_line(point)
+
+        lines = self.get_lines()
+        ranking = self.rankings.get(point)
+        if ranking is None:
+            costs = self.get_costs(point)
+            order = np.lexsort((-np.arange(len(costs)), costs))
+            ranking = [costs, order, 0]
+            self.rankings[point] = ranking
+
+        costs, order, position = ranking
+        while position < len(order) and lines[order[position]] in excluded_lines:
+            position += 1
+        ranking[2] = position
+
+        if position == len(order):
+            return None, None
+
+        i = order[position]
+        return float(costs[i]), lines[i]
+
+    def add(self, point):
+        if point not in self.best:
+            self.set_best(point, *self.get_best_line(point))
+        return self.best[point]
+
+    def remove(self, point):
+        if point in self.best:
+            _, line = self.best.pop(point)
+            self.points_by_line[line].pop(point)
+            if not self.points_by_line[line]:
+                del self.points_by_line[line]
+
+    def set_best(self, point, cost, line):
+        self.remove(point)
+        self.best[point] = (cost, line)
+        self.points_by_line.setdefault(line, {})[point] = None
+
+    def update(self, removed_line, line1, line2, inserted_point):
+        """
+        Update the table after the insertion of inserted_point,
+        which replaced removed_line by line1 and line2.
+        """
+
+        self.remove(inserted_point)
+
+        outdated_points = list(self.points_by_line.get(removed_line, ()))
+        for point in outdated_points:
+            self.remove(point)
+
+        # Position of each line in polygon.lines, only needed on equal costs
+        positions = None
+
+        for point, (cost, line) in list(self.best.items()):
+            best_cost, best_line = cost, line
+            for new_line in (line1, line2):
+                new_cost = get_insertion_cost(point, new_line, self.constraint)
+                if new_cost < best_cost:
+                    best_cost = new_cost
+                    best_line = new_line
+                elif new_cost == best_cost:
+                    # Like get_best_line, the last line of polygon.lines is taken
+                    if positions is None:
+                        positions = {ln: i for i, ln in enumerate(self.polygon.lines)}
+                    if positions[new_line] > positions[best_line]:
+                        best_line = new_line
+
+            if best_line is not line:
+                self.set_best(point, best_cost, best_line)
+
+        for point in outdated_points:
+            self.set_best(point, *self.get_best_line(point))
+
+
+class AreaInsertionTable(InsertionCostTable):
+    """
+    Under MINIMIZE_AREA, all the included points that are not vertices
+    are candidates, and the biggest triangles of a point often
+    intersect the polygon, so many of its lines are rejected one after
+    the other before an insertion is found.
+
+    Here, the triangles of a point with all the lines are evaluated at
+    once with numpy, on the lines' coordinates (kept until the polygon
+    changes). The results are the same as the loop (the last line is
+    taken on equal areas).
+    """
+
+    def __init__(self, polygon, constraint=MINIMIZE_AREA):
+        super().__init__(polygon, constraint)
+        self.coordinates_lines = None
+        self.lines_coordinates = None
+
+    def get_lines_coordinates(self):
+        lines = self.get_lines()
+        if lines is not self.coordinates_lines:
+            self.coordinates_lines = lines
+            self.lines_coordinates = poly_utils.get_edges_coordinates(self.polygon)
+        return self.lines_coordinates
+
+    def get_costs(self, point):
+        x1, y1, x2, y2 = self.get_lines_coordinates()
+        px, py = point.x, point.y
+        return -np.abs(((x1 * y2 - x2 * y1) + (x2 * py - px * y2) + (px * y1 - x1 * py)) / 2)
+
+    def search_best_line(self, point):
+        costs = self.get_costs(point)
+        if len(costs) == 0:
+            return None, None
+
+        i = len(costs) - 1 - int(np.argmin(costs[::-1]))
+        return float(costs[i]), self.lines[i]
+
+
+class ProblematicPointTracker:
+    """
+    Keeps, between two optimization steps, which points are inside
+    the polygon and which points are vertices.
+
+    When a point p is inserted in the line a -> b, only the points in
+    the triangle (a, p, b) change side. For the Ray-Casting test, the
+    parity of the crossings with the lines a -> b, a -> p and p -> b
+    gives exactly these points.
+    """
+
+    def __init__(self, points, polygon, constraint=MINIMIZE_PERIMETER):
+        self.points = points
+        self.nb_points = len(points)
+        self.constraint = constraint
+        self.moves = poly.Point.moves  # The coordinates and states below are copies
+
+        self.xs, self.ys = poly_utils.get_points_coordinates(points)
+        self.states = np.fromiter((pt.state for pt in points), dtype=np.uint8, count=len(points))
+        self.indexes = {pt: i for i, pt in enumerate(points)}
+
+        self.is_vertex = np.fromiter((polygon.has_vertex(pt) for pt in points), dtype=bool, count=len(points))
+        self.inside = poly_utils.points_in_polygon(points, polygon)
+
+    def is_valid(self, points, constraint):
+        return points is self.points and len(points) == self.nb_points and constraint == self.constraint and \
+            self.moves == poly.Point.moves
+
+    def update(self, a, p, b):
+        """
+        Update the classification after the insertion of p
+        between a and b.
+        """
+
+        i = self.indexes.get(p)
+        if i is not None:
+            self.is_vertex[i] = True
+
+        # Only the points at the height of the triangle can cross it
+        y_min, y_max = min(a.y, p.y, b.y), max(a.y, p.y, b.y)
+        candidates = np.flatnonzero((self.ys >= y_min) & (self.ys <= y_max))
+        if len(candidates) == 0:
+            return
+
+        # Same lines directions as in the polygon, so the results are the same
+        x1 = np.array([a.x, a.x, p.x])
+        y1 = np.array([a.y, a.y, p.y])
+        x2 = np.array([b.x, p.x, b.x])
+        y2 = np.array([b.y, p.y, b.y])
+        in_triangle = poly_utils.coordinates_in_polygon(self.xs[candidates], self.ys[candidates], x1, y1, x2, y2)
+
+        self.inside[candidates[in_triangle]] ^= True
+
+    def get_problematic_points(self):
+        """
+        Same points (and order) as get_included_excluded
+        followed by get_excluded_included.
+        """
+
+        not_vertex = ~self.is_vertex
+        included_excluded = not_vertex & (self.states == poly.EXCLUDED) & self.inside
+        excluded_included = not_vertex & (self.states == poly.INCLUDED)
+        if self.constraint == MINIMIZE_PERIMETER:
+            excluded_included &= ~self.inside
+
+        return [self.points[i] for i in np.flatnonzero(included_excluded)] + \
+               [self.points[i] for i in np.flatnonzero(excluded_included)]
+
+
+def convex_hull(points, method=HULL_AUTO):
     """
-    Using the Jarvis' Algorithm
     Find a convex polygon that includes all Included Points.
+    All methods give the same polygon: counterclockwise, starting
+    at the most left point, without the collinear points.
+
+    :param points: A list of all excluded and included points (or a PointSet)
+    :param method: HULL_JARVIS, HULL_MONOTONE_CHAIN, HULL_NUMPY or HULL_AUTO
+    :return: The convex hull polygon
+    """
 
-    :param points: A list of all excluded and included points
-    :return:
+    if method == HULL_AUTO:
+        method = HULL_NUMPY if len(points) >= NUMPY_HULL_MIN_POINTS else HULL_MONOTONE_CHAIN
+
+    if method == HULL_JARVIS:
+        return jarvis_convex_hull(points)
+    elif method == HULL_MONOTONE_CHAIN:
+        return monotone_chain_convex_hull(points)
+    elif method == HULL_NUMPY:
+        return numpy_convex_hull(points)
+
+    raise ValueError(f"Unknown convex hull method '{method}'.")
+
+
+def jarvis_convex_hull(points):
+    """
+    Using the Jarvis' Algorithm, O(n * h)
     """
 
     included_points = [pt for pt in points if pt.state == poly.INCLUDED]
@@ -123,6 +421,103 @@ def convex_hull(points):
     return poly.Polygon(polygon_points, create_patch=False, update_bounds=False)
 
 
+def monotone_chain_convex_hull(points):
+    """
+    Using the Andrew's Monotone Chain Algorithm, O(n log n)
+    The points are sorted from left to right, then the lower and
+    upper halves of the hull are built by removing each point
+    that does not make a counterclockwise turn.
+    """
+
+    included_points = [pt for pt in points if pt.state == poly.INCLUDED]
+    if not included_points:
+        return poly.Polygon(create_patch=False, update_bounds=False)
+
+    sorted_points = sorted(included_points, key=lambda pt: (pt.x, pt.y))
+    polygon_points = chain_hull(sorted_points)
+    polygon_points = start_at_most_left(polygon_points, included_points)
+
+    return poly.Polygon(polygon_points, create_patch=False, update_bounds=False)
+
+
+def numpy_convex_hull(points):
+    """
+    Monotone Chain Algorithm, for big datasets.
+    The points strictly inside the quadrilateral formed by the
+    four extreme points cannot be on the hull, so they are removed
+    (vectorized) before sorting and chaining the others.
+    """
+
+    point_set = points if isinstance(points, poly.PointSet) else poly.PointSet.from_points(points)
+    included = np.flatnonzero(point_set.states == poly.INCLUDED)
+    if len(included) == 0:
+        return poly.Polygon(create_patch=False, update_bounds=False)
+
+    xs, ys = point_set.x[included], point_set.y[included]
+
+    # Extreme points, in counterclockwise order
+    extremes = [np.argmin(xs - ys), np.argmin(xs + ys), np.argmax(xs - ys), np.argmax(xs + ys)]
+    ex, ey = xs[extremes], ys[extremes]
+    strictly_inside = np.ones(len(xs), dtype=bool)
+    for i in range(4):
+        x1, y1, x2, y2 = ex[i], ey[i], ex[(i + 1) % 4], ey[(i + 1) % 4]
+        strictly_inside &= (x2 - x1) * (ys - y1) - (y2 - y1) * (xs - x1) > 0
+
+    candidates = np.flatnonzero(~strictly_inside)
+    candidates = candidates[np.lexsort((ys[candidates], xs[candidates]))]
+    polygon_points = chain_hull([points[included[i]] for i in candidates])
+
+    # Same start as the Jarvis' march: first included point with the smallest x
+    most_left = [points[i] for i in included[np.flatnonzero(xs == xs.min())]]
+    polygon_points = start_at_most_left(polygon_points, most_left)
+
+    return poly.Polygon(polygon_points, create_patch=False, update_bounds=False,
+                        point_set=point_set if point_set is points else None)
+
+
+def chain_hull(sorted_points):
+    """
+    Build the counterclockwise hull of points sorted by (x, y).
+    Collinear points are not kept.
+    """
+
+    if len(sorted_points) <= 2:
+        return sorted_points
+
+    lower = []
+    for pt in sorted_points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], pt) <= 0:
+            lower.pop()
+        lower.append(pt)
+
+    upper = []
+    for pt in reversed(sorted_points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], pt) <= 0:
+            upper.pop()
+        upper.append(pt)
+
+    return lower[:-1] + upper[:-1]
+
+
+def start_at_most_left(polygon_points, points):
+    """
+    Rotate the hull so it starts at the first point (in the dataset
+    order) with the smallest x that is a vertex of the hull.
+    """
+
+    if not polygon_points:
+        return polygon_points
+
+    min_x = min(pt.x for pt in polygon_points)
+    hull_indexes = {pt: i for i, pt in enumerate(polygon_points)}
+    for pt in points:
+        if pt.x == min_x and pt in hull_indexes:
+            start = hull_indexes[pt]
+            return polygon_points[start:] + polygon_points[:start]
+
+    return polygon_points
+
+
 def cross(current_pt, next_pt, pt):
     """
     Find the determinant between:
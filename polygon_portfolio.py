@@ -0,0 +1,174 @@
+import polygon as poly
+import polygon_generator as poly_gen
+from constants import *
+
+import math
+import time
+import random
+from multiprocessing import Pool, Value
+
+"""
+Portfolio of insertion strategies.
+The greedy rule of exclude_or_include_next is not always optimal,
+so several strategies are run at the same time (one process each),
+and the best valid polygon is kept.
+
+The best value found is shared between the processes. Under
+MINIMIZE_PERIMETER, an insertion can only make the perimeter
+longer, so a strategy stops as soon as its perimeter is already
+worse than the best one. The area can grow or shrink, so under
+MINIMIZE_AREA the strategies always finish.
+"""
+
+# (strategy, seed) pairs, the seed is only used by STRATEGY_RANDOMIZED
+DEFAULT_STRATEGIES = [
+    (STRATEGY_GREEDY, None),
+    (STRATEGY_NEAREST_EDGE, None),
+    (STRATEGY_RANDOMIZED, 1),
+    (STRATEGY_RANDOMIZED, 2),
+    (STRATEGY_REVERSED, None)
+]
+
+# Number of steps between two comparisons with the best value
+BOUND_CHECK_STEPS = 10
+
+# Best value found by a process (multiprocessing.Value, set in each process by init_worker)
+best_value = None
+
+
+class StrategyResult:
+    """
+    What a strategy gives back to the main process.
+    order holds the indices (in the dataset) of the polygon's
+    vertices, so no Point object is sent between processes.
+    """
+    def __init__(self, strategy, seed, order=None, value=None, valid=False, pruned=False, steps=0,
+                 elapsed_time=0):
+        self.strategy = strategy
+        self.seed = seed
+        self.order = order
+        self.value = value
+        self.valid = valid
+        self.pruned = pruned
+        self.steps = steps
+        self.elapsed_time = elapsed_time
+
+    def __str__(self):
+        return f"StrategyResult(strategy={self.strategy}, seed={self.seed}, value={self.value}, " \
+               f"valid={self.valid}, pruned={self.pruned}, steps={self.steps}, " \
+               f"elapsed_time={self.elapsed_time:.3f})"
+
+
+def init_worker(shared_best_value):
+    global best_value
+    best_value = shared_best_value
+
+
+def get_value(polygon, constraint):
+    return polygon.get_perimeter() if constraint == MINIMIZE_PERIMETER else polygon.get_area()
+
+
+def run_strategy(x, y, states, constraint, strategy, seed, deadline):
+    """
+    Optimizes the convex hull of the dataset with one strategy,
+    until it is done, worse than the best value or past the deadline
+    (a time.time() value, or None).
+    """
+
+    start_time = time.time()
+    point_set = poly.PointSet(x, y, states)
+
+    polygon = poly.Polygon(create_patch=False, update_bounds=False)
+    polygon.convex_hull(point_set)
+    if strategy == STRATEGY_REVERSED:
+        polygon.points = polygon.points[::-1]
+
+    rng = random.Random(seed)
+    result = StrategyResult(strategy, seed)
+
+    status = None
+    while deadline is None or time.time() < deadline:
+        time_budget = None if deadline is None else deadline - time.time()
+        status = polygon.max_optimize(point_set, update_patch=False, update_bounds=False, constraint=constraint,
+                                      time_budget=time_budget, max_steps=BOUND_CHECK_STEPS, strategy=strategy,
+                                      rng=rng)
+        result.steps += status.steps
+
+        if status.completed:
+            break
+        if constraint == MINIMIZE_PERIMETER and polygon.get_perimeter() >= best_value.value:
+            result.pruned = True
+            break
+
+    result.order = [int(i) for i in polygon.get_vertex_order()]
+    result.value = get_value(polygon, constraint)
+    result.valid = status is not None and status.completed and status.problematic_points == 0
+
+    if result.valid:
+        with best_value.get_lock():
+            if result.value < best_value.value:
+                best_value.value = result.value
+
+    result.elapsed_time = time.time() - start_time
+    return result
+
+
+def solve(points, constraint=MINIMIZE_PERIMETER, strategies=None, time_budget=None, processes=None):
+    """
+    Runs the strategies in a process pool and returns the best
+    valid polygon (made of the given points).
+
+    :param points: Dataset (list of points or PointSet)
+    :param constraint: Minimization parameter (perimeter or area)
+    :param strategies: List of (strategy, seed), DEFAULT_STRATEGIES by default
+    :param time_budget: Maximum time in seconds (None to wait for all strategies)
+    :param processes: Number of processes (one per strategy by default)
+    :return: (best polygon, or None if no strategy found a valid one, list of StrategyResult)
+    """
+
+    if strategies is None:
+        strategies = DEFAULT_STRATEGIES
+
+    point_set = points if isinstance(points, poly.PointSet) else poly.PointSet.from_points(points)
+    deadline = None if time_budget is None else time.time() + time_budget
+
+    shared_best_value = Value('d', math.inf)
+    tasks = [(point_set.x, point_set.y, point_set.states, constraint, strategy, seed, deadline)
+             for strategy, seed in strategies]
+
+    with Pool(processes or len(strategies), initializer=init_worker, initargs=(shared_best_value,)) as pool:
+        results = pool.starmap(run_strategy, tasks)
+
+    # On equal values, the first strategy of the list is kept
+    best_result = None
+    for result in results:
+        if result.valid and (best_result is None or result.value < best_result.value):
+            best_result = result
+
+    if best_result is None:
+        return None, results
+
+    return poly.Polygon([points[i] for i in best_result.order]), results
+
+
+if __name__ == "__main__":
+    """
+    Runs the portfolio on a few random datasets and shows
+    what each strategy found.
+    """
+
+    constraint = MINIMIZE_PERIMETER
+    for seed in range(10):
+        data = poly_gen.get_random_points(seed, 100, 100)
+
+        t = time.time()
+        best_polygon, results = solve(data, constraint, time_budget=10)
+        elapsed_time = time.time() - t
+
+        if best_polygon is None:
+            print(f"Seed: {seed} | No valid polygon (in {elapsed_time:.4f} s)")
+        else:
+            print(f"Seed: {seed} | Best: {get_value(best_polygon, constraint):.4f} u (in {elapsed_time:.4f} s)")
+
+        for result in results:
+            print(f"\t{result}")
@@ -4,15 +4,62 @@ import polygon as poly
 import polygon_optimization as poly_optim
 from constants import *
 
+# Maximum number of (point, edge) pairs tested at once in the batch classification
+CLASSIFICATION_CHUNK_SIZE = 1 << 20
+
+
+def get_vertex_coordinates(polygon):
+    """
+    Returns the (x, y) arrays of the vertices, in order, when the
+    polygon is array-backed (a PointSet, or a Polygon built from one).
+    Returns None when only the object representation is available.
+    """
+
+    if isinstance(polygon, poly.PointSet):
+        return polygon.x, polygon.y
+
+    order = polygon.get_vertex_order()
+    if order is None:
+        return None
+
+    return polygon.point_set.x[order], polygon.point_set.y[order]
+
 
 def calculate_bounds(polygon):
     """
-    Loop through the polygon's lines to find
+    Returns the [center, size] of the rectangle
+    around the polygon.
+    """
+
+    x_bounds, y_bounds = calculate_extremums(polygon)
+
+    x_size = x_bounds[1] - x_bounds[0]
+    y_size = y_bounds[1] - y_bounds[0]
+    bounds = [
+        (x_bounds[0] + x_size / 2, y_bounds[0] + y_size / 2),
+        (x_size, y_size)
+    ]
+
+    return bounds
+
+
+def calculate_extremums(polygon):
+    """
+    Loop through the polygon's points to find
     the extremums.
+
+    :return: ([x_min, x_max], [y_min, y_max])
     """
 
+    coordinates = get_vertex_coordinates(polygon)
+    if coordinates is not None:
+        xs, ys = coordinates
+        if len(xs) == 0:
+            return [0, 0], [0, 0]
+        return [float(xs.min()), float(xs.max())], [float(ys.min()), float(ys.max())]
+
     if len(polygon.points) == 0:
-        return [(0, 0), (0, 0)]
+        return [0, 0], [0, 0]
 
     x_bounds = None
     y_bounds = None
@@ -33,14 +80,7 @@ def calculate_bounds(polygon):
             max(y_bounds[1], point.y)
         ]
 
-    x_size = x_bounds[1] - x_bounds[0]
-    y_size = y_bounds[1] - y_bounds[0]
-    bounds = [
-        (x_bounds[0] + x_size / 2, y_bounds[0] + y_size / 2),
-        (x_size, y_size)
-    ]
-
-    return bounds
+    return x_bounds, y_bounds
 
 
 def point_in_polygon(point, polygon):
@@ -56,6 +96,10 @@ def point_in_polygon(point, polygon):
         the border.
     """
 
+    coordinates = get_vertex_coordinates(polygon)
+    if coordinates is not None:
+        return point_in_array_polygon(point.x, point.y, *coordinates)
+
     lines_crossed = 0
     for line in polygon.lines:
         x1, y1 = line.point1.x, line.point1.y
@@ -72,8 +116,118 @@ def point_in_polygon(point, polygon):
     return lines_crossed % 2 == 1
 
 
+def point_in_array_polygon(x, y, xs, ys):
+    """
+    Same Ray-Casting test, with all the edges (xs[i] -> xs[i + 1])
+    tested at once.
+    """
+
+    if len(xs) < 2:
+        return False
+
+    x1, y1 = xs, ys
+    x2, y2 = np.roll(xs, -1), np.roll(ys, -1)
+
+    at_height = ((y1 <= y) & (y < y2)) | ((y2 <= y) & (y < y1))
+    x1, y1, x2, y2 = x1[at_height], y1[at_height], x2[at_height], y2[at_height]
+    edge_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+
+    return np.count_nonzero(edge_x >= x) % 2 == 1
+
+
+def get_points_coordinates(points):
+    """
+    Returns the (x, y) arrays of a list of points.
+    """
+
+    if isinstance(points, poly.PointSet):
+        return points.x, points.y
+
+    xs = np.fromiter((pt.x for pt in points), dtype=np.float64, count=len(points))
+    ys = np.fromiter((pt.y for pt in points), dtype=np.float64, count=len(points))
+    return xs, ys
+
+
+def get_edges_coordinates(polygon):
+    """
+    Returns the (x1, y1, x2, y2) arrays of all the polygon's edges.
+    """
+
+    coordinates = get_vertex_coordinates(polygon)
+    if coordinates is not None:
+        xs, ys = coordinates
+        return xs, ys, np.roll(xs, -1), np.roll(ys, -1)
+
+    nb_lines = len(polygon.lines)
+    x1 = np.fromiter((ln.point1.x for ln in polygon.lines), dtype=np.float64, count=nb_lines)
+    y1 = np.fromiter((ln.point1.y for ln in polygon.lines), dtype=np.float64, count=nb_lines)
+    x2 = np.fromiter((ln.point2.x for ln in polygon.lines), dtype=np.float64, count=nb_lines)
+    y2 = np.fromiter((ln.point2.y for ln in polygon.lines), dtype=np.float64, count=nb_lines)
+    return x1, y1, x2, y2
+
+
+def points_in_polygon(points, polygon, chunk_size=CLASSIFICATION_CHUNK_SIZE):
+    """
+    Batch version of point_in_polygon.
+    All the points are tested against all the edges at once
+    (with numpy broadcasting). The points are split in chunks so
+    at most chunk_size (point, edge) pairs are in memory.
+
+    :return: A boolean mask, True for the points inside the polygon
+    """
+
+    xs, ys = get_points_coordinates(points)
+    return coordinates_in_polygon(xs, ys, *get_edges_coordinates(polygon), chunk_size=chunk_size)
+
+
+def coordinates_in_polygon(xs, ys, x1, y1, x2, y2, chunk_size=CLASSIFICATION_CHUNK_SIZE):
+    """
+    Same Ray-Casting test as point_in_polygon, on the arrays of
+    points (xs, ys) and of edges (x1, y1) -> (x2, y2).
+    """
+
+    inside = np.zeros(len(xs), dtype=bool)
+    if len(xs) == 0 or len(x1) == 0:
+        return inside
+
+    rows = max(1, chunk_size // len(x1))
+    for start in range(0, len(xs), rows):
+        px = xs[start:start + rows, np.newaxis]
+        py = ys[start:start + rows, np.newaxis]
+
+        at_height = ((y1 <= py) & (py < y2)) | ((y2 <= py) & (py < y1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            edge_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+
+        lines_crossed = np.count_nonzero(at_height & (edge_x >= px), axis=1)
+        inside[start:start + rows] = lines_crossed % 2 == 1
+
+    return inside
+
+
 def calculate_area(polygon):
-    return calculate_lines_area(polygon.lines)
+    return abs(calculate_signed_area(polygon))
+
+
+def calculate_signed_area(polygon):
+    """
+    Area of the polygon, positive if the polygon is
+    counterclockwise, negative otherwise.
+    """
+
+    coordinates = get_vertex_coordinates(polygon)
+    if coordinates is not None:
+        return calculate_array_signed_area(*coordinates)
+
+    return calculate_lines_signed_area(polygon.lines)
+
+
+def calculate_array_signed_area(xs, ys):
+    # Showlace formula, on the vertices arrays
+    if len(xs) < 2:
+        return 0
+    total_area = np.sum(xs * np.roll(ys, -1) - np.roll(xs, -1) * ys)
+    return float(total_area) / 2
 
 
 def calculate_lines_area(lines):
@@ -84,13 +238,17 @@ def calculate_lines_area(lines):
     sum of the determinants of all lines.
     """
 
+    return abs(calculate_lines_signed_area(lines))
+
+
+def calculate_lines_signed_area(lines):
     total_area = 0
     for line in lines:
         x1, y1 = line.point1.x, line.point1.y
         x2, y2 = line.point2.x, line.point2.y
         total_area += x1 * y2 - x2 * y1
 
-    return abs(total_area) / 2
+    return total_area / 2
 
 
 def calculate_perimeter(polygon):
@@ -98,6 +256,10 @@ def calculate_perimeter(polygon):
     Add each lines' lengths together.
     """
 
+    coordinates = get_vertex_coordinates(polygon)
+    if coordinates is not None:
+        return calculate_array_perimeter(*coordinates)
+
     perimeter = 0
     for line in polygon.lines:
         perimeter += line.get_length()
@@ -105,6 +267,12 @@ def calculate_perimeter(polygon):
     return perimeter
 
 
+def calculate_array_perimeter(xs, ys):
+    if len(xs) < 2:
+        return 0
+    return float(np.sum(np.hypot(np.roll(xs, -1) - xs, np.roll(ys, -1) - ys)))
+
+
 def point_to_line_distance(point, line):
     """
     Use the linear algebra formulas to calculate this distance.
@@ -137,15 +305,10 @@ def get_included_excluded(points, polygon):
     """
     Returns a list of all excluded points that are still in the polygon
     """
-    included_excluded_points = []
-
-    for point in points:
-        if point.state == poly.EXCLUDED and point not in polygon.points:
-            inside = polygon.point_in_polygon(point)
-            if inside:
-                included_excluded_points.append(point)
+    candidates = [pt for pt in points if pt.state == poly.EXCLUDED and not polygon.has_vertex(pt)]
+    inside = points_in_polygon(candidates, polygon)
 
-    return included_excluded_points
+    return [pt for pt, pt_inside in zip(candidates, inside) if pt_inside]
 
 
 def get_excluded_included(points, polygon, constraint=MINIMIZE_PERIMETER):
@@ -153,18 +316,13 @@ def get_excluded_included(points, polygon, constraint=MINIMIZE_PERIMETER):
     Returns a list of all included points that are still outside the polygon
     """
 
-    excluded_included_points = []
+    candidates = [pt for pt in points if pt.state == poly.INCLUDED and not polygon.has_vertex(pt)]
+    if constraint != MINIMIZE_PERIMETER:
+        return candidates
 
-    for point in points:
-        if point.state == poly.INCLUDED and point not in polygon.points:
-            if constraint == MINIMIZE_PERIMETER:
-                outside = not polygon.point_in_polygon(point)
-                if outside:
-                    excluded_included_points.append(point)
-            else:
-                excluded_included_points.append(point)
+    inside = points_in_polygon(candidates, polygon)
 
-    return excluded_included_points
+    return [pt for pt, pt_inside in zip(candidates, inside) if not pt_inside]
 
 
 def intersects_with_line(line1, line2):
@@ -173,6 +331,12 @@ def intersects_with_line(line1, line2):
     and most efficient.
     """
 
+    # Two lines with separated bounding boxes cannot intersect
+    x_min1, y_min1, x_max1, y_max1 = line1.get_bounding_box()
+    x_min2, y_min2, x_max2, y_max2 = line2.get_bounding_box()
+    if x_max1 < x_min2 or x_max2 < x_min1 or y_max1 < y_min2 or y_max2 < y_min1:
+        return False
+
     o1 = poly_optim.cross(line1.point1, line1.point2, line2.point1)
     o2 = poly_optim.cross(line1.point1, line1.point2, line2.point2)
     o3 = poly_optim.cross(line2.point1, line2.point2, line1.point1)
@@ -205,8 +369,18 @@ def on_segment(p1, p2, p):
 
 
 def intersects_with_polygon(line, polygon):
-    return any([intersects_with_line(line, l) for l in polygon.lines])
+    return multiple_intersects_with_polygon([line], polygon)
 
 
 def multiple_intersects_with_polygon(lines, polygon):
-    return any([any([intersects_with_line(line, l) for line in lines]) for l in polygon.lines])
+    """
+    Only the polygon's lines in the grid cells crossed by the
+    lines are tested (when the polygon is big enough to have
+    a grid), and the search stops at the first intersection.
+    """
+
+    grid = polygon.get_edge_grid()
+    if grid is not None:
+        return grid.intersects(lines)
+
+    return any(intersects_with_line(line, l) for l in polygon.lines for line in lines)
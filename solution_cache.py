@@ -0,0 +1,137 @@
+import os
+import hashlib
+import numpy as np
+
+import polygon as poly
+from constants import *
+
+"""
+Cache of the optimized polygons, stored on disk.
+The same datasets are often solved again (like when a dataset
+is reset in the interface), so the polygon found is kept
+with a key made from everything that changes the result:
+the coordinates and states of the points, the constraint,
+the strategy and the starting polygon.
+
+Each solution is a file holding the indices (in the dataset)
+of the polygon's vertices. When the files take more than
+max_size bytes, the least recently used ones are deleted.
+"""
+
+DEFAULT_CACHE_DIRECTORY = "cache"
+DEFAULT_CACHE_MAX_SIZE = 10_000_000  # In bytes
+
+
+class SolutionCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_size=DEFAULT_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_key(self, points, polygon, constraint=MINIMIZE_PERIMETER, strategy=STRATEGY_GREEDY):
+        """
+        Returns the key of the solution starting from the polygon,
+        or None if the polygon is not made of the dataset's points.
+        """
+
+        order = get_vertex_indices(points, polygon)
+        if order is None:
+            return None
+
+        point_set = points if isinstance(points, poly.PointSet) else poly.PointSet.from_points(points)
+
+        key = hashlib.sha256()
+        key.update(np.array([len(point_set), len(order), constraint, strategy], dtype=np.int64).tobytes())
+        key.update(point_set.x.tobytes())
+        key.update(point_set.y.tobytes())
+        key.update(point_set.states.tobytes())
+        key.update(np.asarray(order, dtype=np.int64).tobytes())
+
+        return key.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key, num_points):
+        """
+        Returns the vertex indices stored with the key (or None).
+        An entry that is not a list of different indices
+        in [0, num_points[ is treated as missing.
+        """
+
+        path = self.get_path(key)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, "r") as file:
+                order = [int(i) for i in file.read().split()]
+        except (OSError, ValueError):
+            return None
+
+        if any(i < 0 or i >= num_points for i in order) or len(set(order)) != len(order):
+            return None
+
+        # Mark the solution as recently used
+        os.utime(path)
+        return order
+
+    def set(self, key, order):
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = self.get_path(key)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(" ".join(str(int(i)) for i in order))
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Delete the least recently used solutions until
+        the cache is under its maximum size.
+        """
+
+        files = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".txt"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total_size <= self.max_size:
+                break
+            os.remove(path)
+            total_size -= size
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".txt"):
+                os.remove(entry.path)
+
+
+def get_vertex_indices(points, polygon):
+    """
+    Returns the indices (in points) of the polygon's vertices, in
+    order, or None if a vertex is not one of the points.
+    """
+
+    if isinstance(points, poly.PointSet) and polygon.point_set is points:
+        order = polygon.get_vertex_order()
+        return None if order is None else [int(i) for i in order]
+
+    indices = {pt: i for i, pt in enumerate(points)}
+
+    order = []
+    for pt in polygon.iterate_vertices():
+        if pt not in indices:
+            return None
+        order.append(indices[pt])
+
+    return order
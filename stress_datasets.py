@@ -0,0 +1,158 @@
+import math
+import numpy as np
+import matplotlib.pyplot as plt
+
+import polygon as poly
+import polygon_generator as poly_gen
+import polygon_utilities as poly_utls
+
+"""
+Datasets made to stress the optimization.
+Random uniform points are the easiest case, these datasets
+are the ones where the number of steps, rejected insertions
+and intersection tests gets big.
+
+Each function takes a seed and the number of included (blue)
+and excluded (red) points, and gives a PointSet. The same seed
+always gives the same dataset, from 10 to 10^6 points.
+"""
+
+
+def get_clustered_blues(seed, included_pts=10, excluded_pts=10, clusters=5, spread=0.03):
+    """
+    Blue points in a few tight clusters, red points everywhere.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    centers = rng.uniform(0.1, 0.9, size=(clusters, 2))
+    cluster = rng.integers(0, clusters, size=included_pts)
+    blues = centers[cluster] + rng.normal(0, spread, size=(included_pts, 2))
+    reds = rng.uniform(0, 1, size=(excluded_pts, 2))
+
+    return get_point_set(blues, reds)
+
+
+def get_interleaved_spirals(seed, included_pts=10, excluded_pts=10, turns=3, noise=0.005):
+    """
+    Two spirals (blue and red) turning around each other.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    def spiral(num_points, offset):
+        t = np.sqrt(rng.uniform(0, 1, size=num_points))  # Same density along the spiral
+        angle = 2 * math.pi * turns * t + offset
+        coordinates = np.column_stack((t * np.cos(angle), t * np.sin(angle)))
+        return coordinates + rng.normal(0, noise, size=(num_points, 2))
+
+    return get_point_set(spiral(included_pts, 0), spiral(excluded_pts, math.pi))
+
+
+def get_red_rings(seed, included_pts=10, excluded_pts=10, cores=3, core_radius=0.1, ring_width=0.02):
+    """
+    Blue disks, each one surrounded by a dense ring of red points.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    centers = rng.uniform(0.2, 0.8, size=(cores, 2))
+
+    def around_centers(num_points, min_radius, max_radius):
+        center = centers[rng.integers(0, cores, size=num_points)]
+        radius = np.sqrt(rng.uniform(min_radius ** 2, max_radius ** 2, size=num_points))
+        angle = rng.uniform(0, 2 * math.pi, size=num_points)
+        return center + np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+    blues = around_centers(included_pts, 0, core_radius)
+    reds = around_centers(excluded_pts, core_radius + ring_width, core_radius + 2 * ring_width)
+
+    return get_point_set(blues, reds)
+
+
+def get_near_collinear(seed, included_pts=10, excluded_pts=10, noise=1e-6):
+    """
+    Blue and red points mixed along the same line, only
+    moved away from it by a tiny noise.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    def on_line(num_points):
+        t = rng.uniform(0, 1, size=num_points)
+        return np.column_stack((t, 0.5 * t)) + rng.normal(0, noise, size=(num_points, 2))
+
+    return get_point_set(on_line(included_pts), on_line(excluded_pts))
+
+
+def get_generated_shape(seed, included_pts=10, excluded_pts=10, scale=1, smoothness=1):
+    """
+    Blue points inside a generated polygon (like Polygon.generate)
+    and red points outside of it.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    shape = poly.Polygon(poly_gen.generate_polygon_points(seed, [0, 0], scale, smoothness),
+                         create_patch=False, update_bounds=False)
+    edges = poly_utls.get_edges_coordinates(shape)
+
+    x_min, y_min, x_max, y_max = edges[0].min(), edges[1].min(), edges[0].max(), edges[1].max()
+    margin = max(x_max - x_min, y_max - y_min) / 4
+    low = [x_min - margin, y_min - margin]
+    high = [x_max + margin, y_max + margin]
+
+    blues, reds = [np.empty((0, 2))], [np.empty((0, 2))]
+    num_blues = num_reds = 0
+    while num_blues < included_pts or num_reds < excluded_pts:
+        coordinates = rng.uniform(low, high, size=(max(included_pts + excluded_pts, 16), 2))
+        inside = poly_utls.coordinates_in_polygon(coordinates[:, 0], coordinates[:, 1], *edges)
+
+        blues.append(coordinates[inside][:included_pts - num_blues])
+        reds.append(coordinates[~inside][:excluded_pts - num_reds])
+        num_blues += len(blues[-1])
+        num_reds += len(reds[-1])
+
+    return get_point_set(np.concatenate(blues), np.concatenate(reds))
+
+
+def get_point_set(blues, reds):
+    """
+    PointSet with the blue (included) points first, then the red ones.
+    """
+
+    coordinates = np.concatenate((blues.reshape(-1, 2), reds.reshape(-1, 2)))
+    states = np.concatenate((np.full(len(blues), poly.INCLUDED), np.full(len(reds), poly.EXCLUDED)))
+    return poly.PointSet(coordinates[:, 0], coordinates[:, 1], states)
+
+
+DATASETS = {
+    "clustered": get_clustered_blues,
+    "spirals": get_interleaved_spirals,
+    "rings": get_red_rings,
+    "collinear": get_near_collinear,
+    "shape": get_generated_shape
+}
+
+
+if __name__ == "__main__":
+    """
+    Show each dataset with matplotlib.
+    """
+
+    num_points = 2000
+
+    fig, axes = plt.subplots(1, len(DATASETS), facecolor="#101010")
+    fig.set_size_inches(4 * len(DATASETS), 4, forward=True)
+
+    for ax, (name, get_dataset) in zip(axes, DATASETS.items()):
+        point_set = get_dataset(0, num_points // 2, num_points // 2)
+        included = point_set.states == poly.INCLUDED
+
+        ax.set_facecolor('#050505')
+        ax.plot(point_set.x[~included], point_set.y[~included], '.', color='red', markersize=2)
+        ax.plot(point_set.x[included], point_set.y[included], '.', color='blue', markersize=2)
+        ax.set_title(name, color="white")
+        ax.set_aspect('equal')
+
+    plt.show()